@@ -0,0 +1,48 @@
+import asyncio
+
+from file_filter import STREAM_CHUNK_SIZE, LineFilter
+
+BATCH_SIZE = 1024 * 1024
+
+
+def _scan_bytes(line_filter, data):
+    return list(line_filter.scan_chunk(data.decode('utf-8')))
+
+
+async def _iter_blocks(stream, chunk_size):
+    if hasattr(stream, 'read'):
+        while block := await stream.read(chunk_size):
+            yield block
+    else:
+        async for block in stream:
+            yield block
+
+
+async def afilter_lines(stream, search_words, stop_words,  # pylint: disable=too-many-arguments
+                        executor=None, batch_size=BATCH_SIZE, chunk_size=STREAM_CHUNK_SIZE):
+    line_filter = LineFilter(search_words, stop_words)
+    loop = asyncio.get_running_loop()
+    pending = None
+    buffer = bytearray()
+
+    async for block in _iter_blocks(stream, chunk_size):
+        buffer += block
+        if len(buffer) < batch_size:
+            continue
+        cut = max(buffer.rfind(b'\n'), buffer.rfind(b'\r'))
+        if cut == -1:
+            continue
+        batch = bytes(buffer[:cut + 1])
+        del buffer[:cut + 1]
+        # The next batch is read from the stream while this one is scanned.
+        if pending is not None:
+            for line in await pending:
+                yield line
+        pending = loop.run_in_executor(executor, _scan_bytes, line_filter, batch)
+
+    if pending is not None:
+        for line in await pending:
+            yield line
+    if buffer:
+        for line in await loop.run_in_executor(executor, _scan_bytes, line_filter, bytes(buffer)):
+            yield line
@@ -1,17 +1,257 @@
-def filter_lines(file_or_path, search_words, stop_words):
-    search_words = {word.lower() for word in search_words}
-    stop_words = {word.lower() for word in stop_words}
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 
-    def process_lines(lines):
+MMAP_CHUNK_SIZE = 16 * 1024 * 1024
+SHARD_SIZE = 4 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+IO_WORKERS = 16
+
+COMPRESSED_FORMATS = (
+    ('.gz', re.compile(rb'\x1f\x8b'), gzip.open),
+    ('.bz2', re.compile(rb'BZh[1-9](?:1AY&SY|\x17rE8P\x90)'), bz2.open),
+    ('.xz', re.compile(rb'\xfd7zXZ\x00'), lzma.open),
+)
+
+
+def _lower_words(words):
+    return {word.lower() for word in words}
+
+
+def _trie_regex(node):
+    alternatives = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in node:
+        return alternatives[0]
+    group = '(?:' + '|'.join(alternatives) + ')'
+    return group + '?' if '' in node else group
+
+
+def _compile_words(words):
+    # Only whole words without whitespace can ever be produced by split().
+    words = [word for word in words if word and word.split() == [word]]
+    if not words:
+        return None
+
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    # \s is the same whitespace class str.split() uses, so (?!\S) gives exactly
+    # its token end. The start is checked in _find_word: a leading lookbehind
+    # would stop re from skipping ahead to the literal prefix.
+    return re.compile(_trie_regex(trie) + r'(?!\S)')
+
+
+def _find_word(pattern, text, pos=0, endpos=None):
+    endpos = len(text) if endpos is None else endpos
+    while (found := pattern.search(text, pos, endpos)) is not None:
+        start = found.start()
+        if start == 0 or text[start - 1].isspace():
+            return start
+        pos = start + 1
+    return -1
+
+
+def _first_break(data, pos, breaks):
+    return min((end for end in (data.find(br, pos) for br in breaks) if end != -1), default=-1)
+
+
+def _line_bounds(text, pos):
+    # Look for \r only inside the \n-delimited line, so files without \r are
+    # not scanned end to end for every hit.
+    start = text.rfind('\n', 0, pos) + 1
+    start = text.rfind('\r', start, pos) + 1 or start
+    end = text.find('\n', pos)
+    end = len(text) if end == -1 else end
+    carriage = text.find('\r', pos, end)
+    return start, end if carriage == -1 else carriage
+
+
+def _compressed_opener(path):
+    with open(path, 'rb') as f:
+        head = f.read(10)
+    for suffix, magic, opener in COMPRESSED_FORMATS:
+        if path.endswith(suffix) or magic.match(head):
+            return opener
+    return None
+
+
+def _open_text(path):
+    opener = _compressed_opener(path)
+    if opener is not None:
+        return opener(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')  # pylint: disable=consider-using-with
+
+
+def _resolve_paths(paths):
+    if not isinstance(paths, (str, os.PathLike)):
+        return [os.fspath(path) for path in paths]
+    paths = os.fspath(paths)
+    if os.path.isdir(paths):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(paths) for name in names)
+    if glob.has_magic(paths):
+        return sorted(path for path in glob.glob(paths, recursive=True) if os.path.isfile(path))
+    return [paths]
+
+
+def split_complete_lines(tail, block):
+    data = tail + block
+    cut = max(data.rfind(b'\n'), data.rfind(b'\r'))
+    if cut == -1:
+        return b'', data
+    return data[:cut + 1], data[cut + 1:]
+
+
+def _aligned_ranges(mm, chunk_size):
+    size = len(mm)
+    offset = 0
+    while offset < size:
+        end = min(offset + chunk_size, size)
+        if end < size:
+            cut = max(mm.rfind(b'\n', offset, end), mm.rfind(b'\r', offset, end))
+            if cut == -1:
+                cut = _first_break(mm, end, (b'\n', b'\r'))
+            end = size if cut == -1 else cut + 1
+        yield offset, end
+        offset = end
+
+
+class LineFilter:
+    def __init__(self, search_words, stop_words):
+        self.search_words = frozenset(_lower_words(search_words))
+        self.stop_words = frozenset(_lower_words(stop_words))
+        self._search_re = _compile_words(self.search_words)
+        self._stop_re = _compile_words(self.stop_words)
+
+    def _rejected(self, lowered, start=0, end=None):
+        if self._stop_re is None:
+            return False
+        return _find_word(self._stop_re, lowered, start, end) != -1
+
+    def match(self, line):
+        if self._search_re is None:
+            return False
+        lowered = line.lower()
+        return not self._rejected(lowered) and _find_word(self._search_re, lowered) != -1
+
+    def filter_lines(self, lines):
         for line in lines:
-            words = set(line.strip().lower().split())
-            if words & stop_words:
-                continue
-            if words & search_words:
+            if self.match(line):
                 yield line.strip()
 
-    if isinstance(file_or_path, str):
-        with open(file_or_path, 'r', encoding='utf-8') as f:
-            yield from process_lines(f)
-    else:
-        yield from process_lines(file_or_path)
+    def scan_chunk(self, text):
+        if self._search_re is None:
+            return
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # newline=None splits on \n, \r and \r\n, like a text-mode file.
+            yield from self.filter_lines(io.StringIO(text, newline=None))
+            return
+
+        pos = 0
+        while (found := _find_word(self._search_re, lowered, pos)) != -1:
+            start, pos = _line_bounds(lowered, found)
+            if not self._rejected(lowered, start, pos):
+                yield text[start:pos].strip()
+
+    def filter_stream(self, stream, chunk_size=STREAM_CHUNK_SIZE):
+        tail = b''
+        while block := stream.read(chunk_size):
+            complete, tail = split_complete_lines(tail, block)
+            if complete:
+                yield from self.scan_chunk(complete.decode('utf-8'))
+        if tail:
+            yield from self.scan_chunk(tail.decode('utf-8'))
+
+    def filter_mmap(self, path, chunk_size=MMAP_CHUNK_SIZE):
+        if self._search_re is None or os.path.getsize(path) == 0:
+            return
+
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in _aligned_ranges(mm, chunk_size):
+                yield from self.scan_chunk(mm[start:end].decode('utf-8'))
+
+    def filter_range(self, path, start, end):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            text = f.read(end - start).decode('utf-8')
+        return list(self.scan_chunk(text))
+
+    def filter_parallel(self, path, workers=None, shard_size=SHARD_SIZE):
+        if self._search_re is None or os.path.getsize(path) == 0:
+            return
+
+        workers = workers or os.cpu_count() or 1
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for start, end in _aligned_ranges(mm, shard_size):
+                pending.append(pool.submit(self.filter_range, path, start, end))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def filter_file(self, path):
+        with _open_text(path) as f:
+            return [(path, line_no, line.strip()) for line_no, line in enumerate(f, 1) if self.match(line)]
+
+    def filter_files(self, paths, workers=IO_WORKERS, ordered=True):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if ordered:
+                pending = deque()
+                for path in _resolve_paths(paths):
+                    pending.append(pool.submit(self.filter_file, path))
+                    if len(pending) >= 2 * workers:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+                return
+
+            pending = set()
+            for path in _resolve_paths(paths):
+                pending.add(pool.submit(self.filter_file, path))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            for future in as_completed(pending):
+                yield from future.result()
+
+    def filter(self, file_or_path, use_mmap=False, chunk_size=MMAP_CHUNK_SIZE):
+        if isinstance(file_or_path, str):
+            opener = _compressed_opener(file_or_path)
+            if opener is not None:
+                with opener(file_or_path, 'rb') as f:
+                    yield from self.filter_stream(f)
+                return
+            if use_mmap:
+                yield from self.filter_mmap(file_or_path, chunk_size)
+                return
+            with open(file_or_path, 'r', encoding='utf-8') as f:
+                yield from self.filter_lines(f)
+        else:
+            yield from self.filter_lines(file_or_path)
+
+
+def filter_lines(file_or_path, search_words, stop_words, use_mmap=False, chunk_size=MMAP_CHUNK_SIZE):
+    yield from LineFilter(search_words, stop_words).filter(file_or_path, use_mmap, chunk_size)
+
+
+def filter_lines_parallel(path, search_words, stop_words, workers=None, shard_size=SHARD_SIZE):
+    yield from LineFilter(search_words, stop_words).filter_parallel(path, workers, shard_size)
+
+
+def filter_files(paths, search_words, stop_words, workers=IO_WORKERS, ordered=True):
+    yield from LineFilter(search_words, stop_words).filter_files(paths, workers, ordered)
@@ -0,0 +1,131 @@
+import argparse
+import dataclasses as dc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from file_filter import filter_lines, filter_lines_parallel
+
+SEARCH_WORD = 'needle'
+STOP_WORD = 'poison'
+
+
+@dc.dataclass(slots=True)
+class CorpusSpec:  # pylint: disable=too-few-public-methods
+    lines: int = 100_000
+    words_per_line: int = 12
+    vocabulary: int = 5_000
+    match_rate: float = 0.05
+    stop_rate: float = 0.01
+    seed: int = 42
+
+
+@dc.dataclass(slots=True)
+class BenchResult:  # pylint: disable=too-few-public-methods
+    mode: str
+    seconds: float
+    lines_per_sec: float
+    mb_per_sec: float
+    peak_memory_bytes: int
+    matches: int
+
+
+def generate_corpus(spec: CorpusSpec, path: str) -> int:
+    rnd = random.Random(spec.seed)
+    vocab = [f'w{i}' for i in range(spec.vocabulary)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(spec.lines):
+            words = rnd.choices(vocab, k=spec.words_per_line)
+            if rnd.random() < spec.match_rate:
+                words[rnd.randrange(len(words))] = SEARCH_WORD.upper()
+            if rnd.random() < spec.stop_rate:
+                words[rnd.randrange(len(words))] = STOP_WORD
+            f.write(' '.join(words) + '\n')
+    return os.path.getsize(path)
+
+
+def _run_path(path):
+    return filter_lines(path, [SEARCH_WORD], [STOP_WORD])
+
+
+def _run_mmap(path):
+    return filter_lines(path, [SEARCH_WORD], [STOP_WORD], use_mmap=True)
+
+
+def _run_iterable(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from filter_lines(f, [SEARCH_WORD], [STOP_WORD])
+
+
+def _run_parallel(path):
+    return filter_lines_parallel(path, [SEARCH_WORD], [STOP_WORD])
+
+
+MODES = {
+    'path': _run_path,
+    'iterable': _run_iterable,
+    'mmap': _run_mmap,
+    'parallel': _run_parallel,
+}
+
+
+def measure(mode: str, path: str, lines: int, size: int, repeat: int = 3) -> BenchResult:
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matches = sum(1 for _ in MODES[mode](path))
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # Separate pass: tracemalloc slows the filter down too much to time it.
+    # Worker processes of the parallel mode are not traced.
+    tracemalloc.start()
+    sum(1 for _ in MODES[mode](path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return BenchResult(mode, seconds, lines / seconds, size / seconds / 2 ** 20, peak, matches)
+
+
+def run(spec: CorpusSpec, modes: list[str], repeat: int = 3) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'corpus.txt')
+        size = generate_corpus(spec, path)
+        results = [measure(mode, path, spec.lines, size, repeat) for mode in modes]
+    return {
+        'python': sys.version.split()[0],
+        'corpus': dc.asdict(spec) | {'bytes': size},
+        'results': [dc.asdict(result) for result in results],
+    }
+
+
+def _cli() -> argparse.Namespace:
+    d = CorpusSpec()
+    p = argparse.ArgumentParser()
+    p.add_argument("--lines", type=int, default=d.lines, help="Строк в корпусе")
+    p.add_argument("--words-per-line", type=int, default=d.words_per_line, help="Слов в строке")
+    p.add_argument("--vocabulary", type=int, default=d.vocabulary, help="Размер словаря")
+    p.add_argument("--match-rate", type=float, default=d.match_rate, help="Доля строк с искомым словом")
+    p.add_argument("--stop-rate", type=float, default=d.stop_rate, help="Доля строк со стоп-словом")
+    p.add_argument("--seed", type=int, default=d.seed)
+    p.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    p.add_argument("--repeat", type=int, default=3, help="Повторов, берётся лучший")
+    p.add_argument("-o", "--output", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    return p.parse_args()
+
+
+def main() -> None:
+    a = _cli()
+    spec = CorpusSpec(a.lines, a.words_per_line, a.vocabulary, a.match_rate, a.stop_rate, a.seed)
+    report = json.dumps(run(spec, a.modes, a.repeat), indent=2)
+    if a.output:
+        with open(a.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+from file_filter import STREAM_CHUNK_SIZE, LineFilter, split_complete_lines
+
+
+def default_checkpoint_path(path):
+    return path + '.ckpt'
+
+
+def load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None, 0
+    return state['inode'], state['offset']
+
+
+def save_checkpoint(checkpoint_path, inode, offset):
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'inode': inode, 'offset': offset}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _open_at(path, inode, offset):
+    try:
+        f = open(path, 'rb')  # pylint: disable=consider-using-with
+    except FileNotFoundError:
+        return None, inode, offset
+    stat = os.fstat(f.fileno())
+    if stat.st_ino != inode or stat.st_size < offset:
+        inode, offset = stat.st_ino, 0
+    f.seek(offset)
+    return f, inode, offset
+
+
+def _replaced(path, inode):
+    try:
+        return os.stat(path).st_ino != inode
+    except FileNotFoundError:
+        # Renamed away but not recreated yet: the writer may still append to
+        # the old file, so keep reading it.
+        return False
+
+
+def follow_lines(path, search_words, stop_words, checkpoint_path=None,  # pylint: disable=too-many-arguments
+                 poll_interval=1.0, should_stop=None, chunk_size=STREAM_CHUNK_SIZE):
+    line_filter = LineFilter(search_words, stop_words)
+    checkpoint_path = checkpoint_path or default_checkpoint_path(path)
+    inode, offset = load_checkpoint(checkpoint_path)
+    f = None
+    tail = b''
+    try:
+        while True:
+            if f is None:
+                f, inode, offset = _open_at(path, inode, offset)
+
+            block = f.read(chunk_size) if f is not None else b''
+            if block:
+                complete, tail = split_complete_lines(tail, block)
+                if not complete:
+                    continue
+                yield from line_filter.scan_chunk(complete.decode('utf-8'))
+                offset += len(complete)
+                save_checkpoint(checkpoint_path, inode, offset)
+                continue
+
+            if f is not None and os.fstat(f.fileno()).st_size < offset + len(tail):
+                f.seek(0)
+                offset, tail = 0, b''
+                save_checkpoint(checkpoint_path, inode, offset)
+                continue
+
+            if f is not None and _replaced(path, inode):
+                f.close()
+                f = None
+                if tail:
+                    yield from line_filter.scan_chunk(tail.decode('utf-8'))
+                inode, offset, tail = None, 0, b''
+                continue
+
+            if should_stop is not None and should_stop():
+                return
+            time.sleep(poll_interval)
+    finally:
+        if f is not None:
+            f.close()
@@ -0,0 +1,195 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'LIDX'
+VERSION = 2
+_PREAMBLE = struct.Struct('<4sIQ')
+
+
+def default_index_path(path):
+    return path + '.idx'
+
+
+def _iter_raw_lines(f):
+    # Splits on \n, \r\n and \r, the same way a text-mode file does.
+    offset = 0
+    for raw in f:
+        content = raw[:-1] if raw.endswith(b'\n') else raw
+        if raw.endswith(b'\r\n'):
+            content = content[:-1]
+        segment_start = offset
+        for segment in content.split(b'\r'):
+            yield segment_start, segment
+            segment_start += len(segment) + 1
+        offset += len(raw)
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def _offsets(sizes):
+    offsets = array('Q', [0])
+    for size in sizes:
+        offsets.append(offsets[-1] + size)
+    return offsets
+
+
+def _write_vocabulary(f, postings):
+    # UTF-8 keeps code point order, so this is also the byte order the
+    # binary search in LineIndex compares in.
+    words = sorted(postings)
+    encoded = [word.encode('utf-8') for word in words]
+    _offsets(len(raw) for raw in encoded).tofile(f)
+    _offsets(len(postings[word]) for word in words).tofile(f)
+    for word in words:
+        postings[word].tofile(f)
+    f.write(b''.join(encoded))
+
+
+def build_index(path, index_path=None):
+    index_path = index_path or default_index_path(path)
+    bounds = array('Q')
+    postings = {}
+    with open(path, 'rb') as f:
+        for line_id, (start, raw) in enumerate(_iter_raw_lines(f)):
+            bounds.append(start)
+            bounds.append(start + len(raw))
+            for word in set(raw.decode('utf-8').lower().split()):
+                postings.setdefault(word, array('I')).append(line_id)
+
+    size, mtime_ns = _source_stamp(path)
+    header = json.dumps({
+        'source_size': size,
+        'source_mtime_ns': mtime_ns,
+        'byteorder': sys.byteorder,
+        'lines': len(bounds) // 2,
+        'words': len(postings),
+    }).encode('utf-8')
+
+    # Written next to the index and renamed over it, so a LineIndex that
+    # still maps the old file keeps working and a reader never sees half of it.
+    tmp_path = f'{index_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            _pad(f)
+            bounds.tofile(f)
+            _write_vocabulary(f, postings)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return index_path
+
+
+class LineIndex:  # pylint: disable=too-many-instance-attributes
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or default_index_path(path)
+        with open(self.index_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.index_path} is not a line index")
+        header_start = _PREAMBLE.size
+        self._header = json.loads(self._mm[header_start:header_start + header_len].decode('utf-8'))
+        if self._header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{self.index_path} was built on a different byte order")
+
+        bounds_start = header_start + header_len
+        bounds_start += -bounds_start % 8
+        lines, words = self._header['lines'], self._header['words']
+        offsets_size = (words + 1) * 8
+        bounds_end = bounds_start + lines * 2 * 8
+        postings_start = bounds_end + 2 * offsets_size
+        self._view = memoryview(self._mm)
+        self._bounds = self._view[bounds_start:bounds_end].cast('Q')
+        self._string_offsets = self._view[bounds_end:bounds_end + offsets_size].cast('Q')
+        self._posting_offsets = self._view[bounds_end + offsets_size:postings_start].cast('Q')
+        self._words_start = postings_start + self._posting_offsets[words] * 4
+        self._postings = self._view[postings_start:self._words_start].cast('I')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for name in ('_bounds', '_string_offsets', '_posting_offsets', '_postings', '_view'):
+            if hasattr(self, name):
+                getattr(self, name).release()
+        self._mm.close()
+
+    def is_stale(self):
+        return _source_stamp(self.path) != (self._header['source_size'], self._header['source_mtime_ns'])
+
+    def _word(self, i):
+        start = self._words_start + self._string_offsets[i]
+        return self._mm[start:self._words_start + self._string_offsets[i + 1]]
+
+    def _find(self, word):
+        key = word.encode('utf-8')
+        lo, hi = 0, self._header['words']
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._header['words'] and self._word(lo) == key:
+            return lo
+        return -1
+
+    def lines_with(self, words):
+        line_ids = set()
+        for word in words:
+            i = self._find(word)
+            if i != -1:
+                line_ids.update(self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]])
+        return line_ids
+
+    def query(self, search_words, stop_words):
+        if self.is_stale():
+            raise ValueError(f"{self.index_path} is stale, rebuild it")
+        line_ids = self.lines_with({word.lower() for word in search_words})
+        line_ids -= self.lines_with({word.lower() for word in stop_words})
+
+        with open(self.path, 'rb') as f:
+            for line_id in sorted(line_ids):
+                start, end = self._bounds[2 * line_id], self._bounds[2 * line_id + 1]
+                f.seek(start)
+                yield f.read(end - start).decode('utf-8').strip()
+
+
+def query_index(path, search_words, stop_words, index_path=None):
+    index_path = index_path or default_index_path(path)
+    if not os.path.exists(index_path):
+        build_index(path, index_path)
+    try:
+        index = LineIndex(path, index_path)
+    except ValueError:
+        # Written by another format version or on another byte order.
+        build_index(path, index_path)
+        index = LineIndex(path, index_path)
+    if index.is_stale():
+        index.close()
+        build_index(path, index_path)
+        index = LineIndex(path, index_path)
+    with index:
+        yield from index.query(search_words, stop_words)
@@ -1,16 +1,44 @@
-from message_model import SomeModel
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
+from message_model import DEFAULT_MODEL, SomeModel, get_model  # pylint: disable=unused-import
 
-def predict_message_mood(
-    message: str,
-    bad_threshold: float = 0.3,
-    good_threshold: float = 0.8,
-) -> str:
-    model = SomeModel()
-    score = model.predict(message)
+MOODS = ("неуд", "норм", "отл")
 
+
+def score_to_mood(score: float, bad_threshold: float, good_threshold: float) -> str:
     if score < bad_threshold:
         return "неуд"
     if score > good_threshold:
         return "отл"
     return "норм"
+
+
+def predict_message_mood(
+    message: str,
+    bad_threshold: float = 0.3,
+    good_threshold: float = 0.8,
+    model_name: str = DEFAULT_MODEL,
+) -> str:
+    score = get_model(model_name).predict(message)
+    return score_to_mood(score, bad_threshold, good_threshold)
+
+
+def predict_messages_mood(
+    messages: list[str],
+    bad_threshold: float = 0.3,
+    good_threshold: float = 0.8,
+    model_name: str = DEFAULT_MODEL,
+) -> list[str]:
+    if not all(isinstance(message, str) for message in messages):
+        raise TypeError("All messages must be strings")
+
+    scores = get_model(model_name).predict_batch(messages)
+    if np is None:
+        return [score_to_mood(score, bad_threshold, good_threshold) for score in scores]
+
+    scores = np.asarray(scores, dtype=float)
+    indexes = np.where(scores < bad_threshold, 0, np.where(scores > good_threshold, 2, 1))
+    return np.array(MOODS)[indexes].tolist()
@@ -1,4 +1,15 @@
+import hashlib
 import random
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULT_MODEL = "default"
 
 
 class SomeModel:
@@ -6,5 +17,155 @@ class SomeModel:
     def predict(self, message: str) -> float:  # pylint: disable=unused-argument
         return random.uniform(0, 1)
 
+    def predict_batch(self, messages):
+        if np is None:
+            return [self.predict(message) for message in messages]
+        return np.random.uniform(0, 1, len(messages))
+
     def mes_len(self, message):
         return len(message)
+
+
+class ScoreCache:
+
+    def __init__(self, capacity: int = 100_000, ttl: float | None = None) -> None:
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("TTL must be positive")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[bytes, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(message: str) -> bytes:
+        return hashlib.blake2b(message.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> float | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or entry[1] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: bytes, score: float) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._data[key] = (score, expires)
+            self._data.move_to_end(key)
+            if len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedModel:
+
+    def __init__(self, model, cache: ScoreCache) -> None:
+        self.model = model
+        self.cache = cache
+
+    def predict(self, message: str) -> float:
+        key = self.cache.digest(message)
+        score = self.cache.get(key)
+        if score is None:
+            score = self.model.predict(message)
+            self.cache.set(key, score)
+        return score
+
+    def predict_batch(self, messages):
+        keys = [self.cache.digest(message) for message in messages]
+        scores = [self.cache.get(key) for key in keys]
+        missing = {}
+        for i, score in enumerate(scores):
+            if score is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            fresh = self.model.predict_batch([messages[indexes[0]] for indexes in missing.values()])
+            for (key, indexes), score in zip(missing.items(), fresh):
+                self.cache.set(key, float(score))
+                for i in indexes:
+                    scores[i] = float(score)
+        return scores
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class ModelRegistry:
+
+    def __init__(self) -> None:
+        self._factories = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._models.pop(name, None)
+
+    def enable_cache(self, name: str = DEFAULT_MODEL, capacity: int = 100_000,
+                     ttl: float | None = None) -> ScoreCache:
+        cache = ScoreCache(capacity, ttl)
+        with self._lock:
+            factory = self._factories[name]
+            self._factories[name] = lambda: CachedModel(factory(), cache)
+            self._models.pop(name, None)
+        return cache
+
+    def get(self, name: str = DEFAULT_MODEL):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    if name not in self._factories:
+                        raise KeyError(f"model {name!r} is not registered")
+                    model = self._factories[name]()
+                    self._models[name] = model
+        return model
+
+    def warm_up(self, *names: str) -> None:
+        for name in names or tuple(self._factories):
+            self.get(name)
+
+    def unload(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                self._models.clear()
+            else:
+                self._models.pop(name, None)
+
+
+registry = ModelRegistry()
+registry.register(DEFAULT_MODEL, SomeModel)
+
+
+def get_model(name: str = DEFAULT_MODEL):
+    return registry.get(name)
+
+
+def warm_up(*names: str) -> None:
+    registry.warm_up(*names)
+
+
+def enable_score_cache(name: str = DEFAULT_MODEL, capacity: int = 100_000, ttl: float | None = None) -> ScoreCache:
+    return registry.enable_cache(name, capacity, ttl)
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from message import predict_messages_mood
+from message_model import DEFAULT_MODEL, warm_up
+
+CHUNK_SIZE = 1000
+
+
+def _init_worker(model_name: str) -> None:
+    warm_up(model_name)
+
+
+def _score_chunk(messages: list[str], bad_threshold: float, good_threshold: float, model_name: str) -> list[str]:
+    return predict_messages_mood(messages, bad_threshold, good_threshold, model_name)
+
+
+def _chunks(lines, chunk_size):
+    lines = (line.rstrip("\r\n") for line in lines)
+    while chunk := list(islice(lines, chunk_size)):
+        yield chunk
+
+
+def score_stream(lines, bad_threshold: float = 0.3, good_threshold: float = 0.8,  # pylint: disable=too-many-arguments
+                 workers: int | None = None, chunk_size: int = CHUNK_SIZE, model_name: str = DEFAULT_MODEL):
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name,)) as pool:
+        pending = deque()
+        for chunk in _chunks(lines, chunk_size):
+            future = pool.submit(_score_chunk, chunk, bad_threshold, good_threshold, model_name)
+            pending.append((chunk, future))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from zip(chunk, future.result())
+
+
+def _cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("file", nargs="?", help="Файл с сообщениями, по одному на строку (по умолчанию stdin)")
+    p.add_argument("-o", "--output", help="Файл для результатов (по умолчанию stdout)")
+    p.add_argument("-w", "--workers", type=int, default=None, help="Число процессов")
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Сообщений в задаче для процесса")
+    p.add_argument("--bad", type=float, default=0.3, help="Порог неуд")
+    p.add_argument("--good", type=float, default=0.8, help="Порог отл")
+    return p.parse_args()
+
+
+def main() -> None:
+    a = _cli()
+    src = open(a.file, encoding="utf-8") if a.file else sys.stdin  # pylint: disable=consider-using-with
+    dst = open(a.output, "w", encoding="utf-8") if a.output else sys.stdout  # pylint: disable=consider-using-with
+    try:
+        for message, mood in score_stream(src, a.bad, a.good, a.workers, a.chunk_size):
+            dst.write(f"{mood}\t{message}\n")
+    finally:
+        if a.file:
+            src.close()
+        if a.output:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
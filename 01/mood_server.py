@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import time
+
+from message import score_to_mood
+from message_model import DEFAULT_MODEL, get_model
+
+
+class MoodBatcher:
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_batch_size: int = 64,
+                 max_wait: float = 0.005, executor=None) -> None:
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        if max_wait < 0:
+            raise ValueError("max_wait cannot be negative")
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self._executor = executor
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "MoodBatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._worker = None
+
+    async def predict_score(self, message: str) -> float:
+        if not isinstance(message, str):
+            raise TypeError("message must be a string")
+        if self._worker is None:
+            raise RuntimeError("MoodBatcher is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((message, future))
+        return await future
+
+    async def predict_message_mood(self, message: str, bad_threshold: float = 0.3,
+                                   good_threshold: float = 0.8) -> str:
+        return score_to_mood(await self.predict_score(message), bad_threshold, good_threshold)
+
+    async def _collect(self, batch: list) -> None:
+        # Fills the caller's list in place, so _run can still see what was
+        # taken off the queue if it is cancelled halfway.
+        batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _predict(self, model, batch: list) -> None:
+        try:
+            scores = await asyncio.get_running_loop().run_in_executor(
+                self._executor, model.predict_batch, [message for message, _ in batch])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Callers must not get this worker's frames in the traceback:
+            # clearing them (as unittest's assertRaises does) kills the worker.
+            e = e.with_traceback(None)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(float(score))
+
+    async def _run(self) -> None:
+        model = get_model(self.model_name)
+        while True:
+            batch = []
+            try:
+                await self._collect(batch)
+                pending = [(message, future) for message, future in batch if not future.done()]
+                if pending:
+                    await self._predict(model, pending)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(batcher: MoodBatcher, requests: int = 10_000, concurrency: int = 256) -> dict:
+    latencies = []
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            await batcher.predict_message_mood(f"message {i % 1000}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "batches": batcher.batches,
+        "seconds": elapsed,
+        "throughput": requests / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def _cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", "--requests", type=int, default=10_000, help="Всего запросов")
+    p.add_argument("-c", "--concurrency", type=int, default=256, help="Одновременных клиентов")
+    p.add_argument("-b", "--max-batch-size", type=int, default=64, help="Максимальный размер батча")
+    p.add_argument("-w", "--max-wait", type=float, default=0.005, help="Максимальное ожидание батча, сек")
+    return p.parse_args()
+
+
+async def _main(a: argparse.Namespace) -> dict:
+    async with MoodBatcher(max_batch_size=a.max_batch_size, max_wait=a.max_wait) as batcher:
+        return await run_load(batcher, a.requests, a.concurrency)
+
+
+def main() -> None:
+    stats = asyncio.run(_main(_cli()))
+    print("  ".join(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+                    for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
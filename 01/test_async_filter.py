@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from async_filter import afilter_lines
+
+DATA = 'роза упала на лапу Азора\r\nлуна светит\nроза цветет в саду\n' * 20 + 'роза'
+EXPECTED = ['роза цветет в саду'] * 20 + ['роза']
+
+
+async def byte_chunks(data, size):
+    for i in range(0, len(data), size):
+        await asyncio.sleep(0)
+        yield data[i:i + size]
+
+
+async def collect(stream, **kwargs):
+    return [line async for line in afilter_lines(stream, ['роза'], ['азора'], **kwargs)]
+
+
+class TestAfilterLines(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_reader(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(DATA.encode('utf-8'))
+        reader.feed_eof()
+        self.assertEqual(EXPECTED, await collect(reader, batch_size=64, chunk_size=7))
+
+    async def test_async_iterable_split_inside_characters(self):
+        result = await collect(byte_chunks(DATA.encode('utf-8'), 3), batch_size=100)
+        self.assertEqual(EXPECTED, result)
+
+    async def test_single_batch(self):
+        self.assertEqual(EXPECTED, await collect(byte_chunks(DATA.encode('utf-8'), 1000)))
+
+    async def test_empty_stream(self):
+        self.assertEqual([], await collect(byte_chunks(b'', 10)))
+
+    async def test_process_executor(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            result = await collect(byte_chunks(DATA.encode('utf-8'), 50), executor=executor, batch_size=200)
+        self.assertEqual(EXPECTED, result)
+
+    async def test_loop_not_blocked(self):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await collect(byte_chunks(DATA.encode('utf-8') * 50, 4096), batch_size=4096)
+        task.cancel()
+        self.assertGreater(len(ticks), 1)
@@ -1,9 +1,13 @@
+import bz2
+import gzip
+import lzma
 import unittest
-from io import StringIO
+from io import BytesIO, StringIO
 import tempfile
 import os
+import random
 
-from file_filter import filter_lines
+from file_filter import LineFilter, filter_files, filter_lines, filter_lines_parallel, split_complete_lines
 
 
 class TestFilterLines(unittest.TestCase):
@@ -129,3 +133,241 @@ class TestFilterLines(unittest.TestCase):
         expected = ['роза', 'роза', 'роза']
         result = list(filter_lines(StringIO(data), search, stop))
         self.assertEqual(expected, result)
+
+
+class TestFilterLinesMmap(unittest.TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as tmp:
+            self.path = tmp.name
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data.encode('utf-8'))
+
+    def assert_same(self, search, stop, chunk_size=8):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            expected = list(filter_lines(f, search, stop))
+        result = list(filter_lines(self.path, search, stop, use_mmap=True, chunk_size=chunk_size))
+        self.assertEqual(expected, result)
+        return result
+
+    def test_basic_match(self):
+        self.write('роза упала на лапу Азора\n\nлуна светит\nРОЗА цветет\nрозан\n')
+        result = self.assert_same(['роза'], ['азора'])
+        self.assertEqual(['РОЗА цветет'], result)
+
+    def test_mixed_line_endings(self):
+        self.write('роза\r\nлуна\rроза луна\nроза')
+        result = self.assert_same(['роза', 'луна'], [], chunk_size=3)
+        self.assertEqual(['роза', 'луна', 'роза луна', 'роза'], result)
+
+    def test_long_line_bigger_than_chunk(self):
+        self.write('x ' * 100 + 'роза\nлуна\n')
+        self.assert_same(['роза'], [], chunk_size=4)
+
+    def test_empty_file(self):
+        self.write('')
+        self.assertEqual([], self.assert_same(['роза'], []))
+
+    def test_empty_and_phrase_search_words(self):
+        self.write('роза цветет\n\n')
+        self.assertEqual([], self.assert_same(['', 'роза цветет'], []))
+
+    def test_lower_changes_length(self):
+        self.write('İstanbul роза\nроза\n')
+        self.assert_same(['роза'], ['i̇stanbul'], chunk_size=1024)
+
+    def test_lower_changes_length_with_carriage_returns(self):
+        self.write('İ stop\rfoo\r\nİ foo\rstop foo\n')
+        result = self.assert_same(['foo'], ['stop'], chunk_size=1024)
+        self.assertEqual(['foo', 'İ foo'], result)
+
+    def test_random_corpus(self):
+        rnd = random.Random(42)
+        vocab = ['роза', 'Луна', 'лес', 'ROSE', 'moon', 'розы', 'а', '123']
+        lines = [' '.join(rnd.choices(vocab, k=rnd.randint(0, 6))) for _ in range(500)]
+        self.write('\n'.join(lines))
+        for chunk_size in (1, 7, 64, 4096):
+            self.assert_same(['роза', 'moon'], ['лес'], chunk_size=chunk_size)
+
+
+class TestFilterLinesParallel(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(7)
+        vocab = ['роза', 'Луна', 'лес', 'ROSE', 'moon', 'розы', 'а', '123']
+        lines = [' '.join(rnd.choices(vocab, k=rnd.randint(0, 6))) for _ in range(2000)]
+        with tempfile.NamedTemporaryFile(delete=False, mode='w', encoding='utf-8', newline='') as tmp:
+            tmp.write('\r\n'.join(lines))
+            self.path = tmp.name
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_same_as_sequential(self):
+        expected = list(filter_lines(self.path, ['роза', 'moon'], ['лес']))
+        result = list(filter_lines_parallel(self.path, ['роза', 'moon'], ['лес'], workers=2, shard_size=256))
+        self.assertTrue(expected)
+        self.assertEqual(expected, result)
+
+    def test_no_search_words(self):
+        self.assertEqual([], list(filter_lines_parallel(self.path, [''], [], workers=2)))
+
+    def test_empty_file(self):
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        self.assertEqual([], list(filter_lines_parallel(self.path, ['роза'], [], workers=2)))
+
+
+def reference_filter(lines, search_words, stop_words):
+    search_words = {word.lower() for word in search_words}
+    stop_words = {word.lower() for word in stop_words}
+    for line in lines:
+        words = set(line.strip().lower().split())
+        if not words & stop_words and words & search_words:
+            yield line.strip()
+
+
+class TestLineFilter(unittest.TestCase):
+    def test_reusable_across_streams(self):
+        line_filter = LineFilter(['роза'], ['азора'])
+        first = list(line_filter.filter(StringIO('роза упала на лапу Азора\nроза цветет\n')))
+        second = list(line_filter.filter(StringIO('Роза\nлуна\n')))
+        self.assertEqual(['роза цветет'], first)
+        self.assertEqual(['Роза'], second)
+
+    def test_split_complete_lines(self):
+        self.assertEqual((b'', b'ab'), split_complete_lines(b'a', b'b'))
+        self.assertEqual((b'a\nb\r', b'c'), split_complete_lines(b'a', b'\nb\rc'))
+        self.assertEqual((b'ab\r\n', b''), split_complete_lines(b'ab', b'\r\n'))
+
+    def test_match(self):
+        line_filter = LineFilter(['роза', 'роз'], ['лес'])
+        self.assertTrue(line_filter.match('  РОЗ  \n'))
+        self.assertTrue(line_filter.match('розовый роза'))
+        self.assertFalse(line_filter.match('розовый'))
+        self.assertFalse(line_filter.match('роза в лесу у лес'))
+        self.assertFalse(line_filter.match(''))
+
+    def test_regex_special_chars(self):
+        line_filter = LineFilter(['a.b', '(x)', 'c++'], [])
+        self.assertTrue(line_filter.match('text a.b'))
+        self.assertFalse(line_filter.match('text axb'))
+        self.assertTrue(line_filter.match('(x) c++'))
+
+    def test_unicode_whitespace_boundaries(self):
+        line_filter = LineFilter(['роза'], [])
+        self.assertTrue(line_filter.match('луна　роза\x1cлес'))
+        self.assertTrue(line_filter.match('роза '))
+        self.assertFalse(line_filter.match('роза_'))
+
+    def test_random_against_reference(self):
+        rnd = random.Random(1)
+        vocab = ['ab', 'abc', 'a', 'b', 'АБ', 'аб', 'abcd', 'x', 'c.d', 'İ']
+        separators = [' ', '  ', '\t', '\x1c', ' ']
+        for _ in range(200):
+            lines = [rnd.choice(separators).join(rnd.choices(vocab, k=rnd.randint(0, 5)))
+                     for _ in range(20)]
+            search = rnd.sample(vocab, 3)
+            stop = rnd.sample(vocab, rnd.randint(0, 2))
+            expected = list(reference_filter(lines, search, stop))
+            line_filter = LineFilter(search, stop)
+            self.assertEqual(expected, list(line_filter.filter(lines)))
+            self.assertEqual(expected, list(line_filter.scan_chunk('\n'.join(lines))))
+
+
+class TestFilterLinesCompressed(unittest.TestCase):
+    data = 'роза упала на лапу Азора\r\nлуна светит\nроза цветет в саду\n' * 50 + 'роза'
+    expected = ['роза цветет в саду'] * 50 + ['роза']
+
+    def check(self, opener, suffix):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            path = tmp.name
+        try:
+            with opener(path, 'wb') as f:
+                f.write(self.data.encode('utf-8'))
+            self.assertEqual(self.expected, list(filter_lines(path, ['роза'], ['азора'])))
+        finally:
+            os.remove(path)
+
+    def test_gzip_by_suffix(self):
+        self.check(gzip.open, '.gz')
+
+    def test_bz2_by_suffix(self):
+        self.check(bz2.open, '.bz2')
+
+    def test_xz_by_suffix(self):
+        self.check(lzma.open, '.xz')
+
+    def test_detected_by_magic_bytes(self):
+        for opener in (gzip.open, bz2.open, lzma.open):
+            self.check(opener, '.log')
+
+    def test_small_stream_chunks(self):
+        line_filter = LineFilter(['роза'], ['азора'])
+        stream = BytesIO(self.data.encode('utf-8'))
+        self.assertEqual(self.expected, list(line_filter.filter_stream(stream, chunk_size=5)))
+
+    def test_plain_text_starting_like_magic(self):
+        with tempfile.NamedTemporaryFile(delete=False, mode='w', encoding='utf-8') as tmp:
+            tmp.write('BZh9 роза\n')
+            path = tmp.name
+        try:
+            self.assertEqual(['BZh9 роза'], list(filter_lines(path, ['роза'], [])))
+        finally:
+            os.remove(path)
+
+
+class TestFilterFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.root = self.tmp_dir.name
+        os.mkdir(os.path.join(self.root, 'sub'))
+        self.files = {
+            'a.txt': 'роза\nлуна\nроза азора\n',
+            'b.log': 'лес\n\nРоза цветет\n',
+            os.path.join('sub', 'c.txt'): 'роза\n',
+        }
+        for name, data in self.files.items():
+            with open(os.path.join(self.root, name), 'w', encoding='utf-8') as f:
+                f.write(data)
+        with gzip.open(os.path.join(self.root, 'd.gz'), 'wt', encoding='utf-8') as f:
+            f.write('луна\nроза\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_directory_in_file_order(self):
+        result = list(filter_files(self.root, ['роза'], ['азора'], workers=2))
+        expected = [
+            (self.path('a.txt'), 1, 'роза'),
+            (self.path('b.log'), 3, 'Роза цветет'),
+            (self.path('d.gz'), 2, 'роза'),
+            (self.path(os.path.join('sub', 'c.txt')), 1, 'роза'),
+        ]
+        self.assertEqual(expected, result)
+
+    def test_glob(self):
+        result = list(filter_files(os.path.join(self.root, '**', '*.txt'), ['роза'], [], workers=2))
+        expected = [
+            (self.path('a.txt'), 1, 'роза'),
+            (self.path('a.txt'), 3, 'роза азора'),
+            (self.path(os.path.join('sub', 'c.txt')), 1, 'роза'),
+        ]
+        self.assertEqual(expected, result)
+
+    def test_list_of_paths_as_completed(self):
+        paths = [self.path('a.txt'), self.path('b.log')] * 5
+        result = list(filter_files(paths, ['роза', 'лес'], [], workers=3, ordered=False))
+        expected = list(filter_files(paths, ['роза', 'лес'], [], workers=3))
+        self.assertEqual(sorted(expected), sorted(result))
+        self.assertEqual(20, len(result))
+
+    def test_single_path(self):
+        result = list(filter_files(self.path('b.log'), ['лес'], []))
+        self.assertEqual([(self.path('b.log'), 1, 'лес')], result)
@@ -0,0 +1,34 @@
+import json
+import os
+import tempfile
+import unittest
+
+from filter_benchmark import MODES, SEARCH_WORD, CorpusSpec, generate_corpus, run
+
+
+class TestFilterBenchmark(unittest.TestCase):
+    def test_generate_corpus_is_reproducible(self):
+        spec = CorpusSpec(lines=200, words_per_line=5, vocabulary=50, match_rate=0.5, seed=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first, second = os.path.join(tmp_dir, 'a.txt'), os.path.join(tmp_dir, 'b.txt')
+            size = generate_corpus(spec, first)
+            generate_corpus(spec, second)
+            with open(first, encoding='utf-8') as f1, open(second, encoding='utf-8') as f2:
+                lines = f1.read().splitlines()
+                self.assertEqual(lines, f2.read().splitlines())
+        self.assertEqual(200, len(lines))
+        self.assertTrue(all(len(line.split()) == 5 for line in lines))
+        self.assertGreater(size, 0)
+        self.assertTrue(any(SEARCH_WORD.upper() in line for line in lines))
+
+    def test_report_is_json_and_modes_agree(self):
+        spec = CorpusSpec(lines=500, vocabulary=100, match_rate=0.2, stop_rate=0.1)
+        report = json.loads(json.dumps(run(spec, list(MODES), repeat=1)))
+        self.assertEqual(500, report['corpus']['lines'])
+        results = report['results']
+        self.assertEqual(list(MODES), [result['mode'] for result in results])
+        self.assertEqual(1, len({result['matches'] for result in results}))
+        for result in results:
+            self.assertGreater(result['lines_per_sec'], 0)
+            self.assertGreater(result['mb_per_sec'], 0)
+            self.assertGreaterEqual(result['peak_memory_bytes'], 0)
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from line_follow import default_checkpoint_path, follow_lines, load_checkpoint
+
+
+class TestFollowLines(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmp_dir.name, 'app.log')
+        self.append('роза упала на лапу Азора\nроза цветет\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def append(self, data, path=None):
+        with open(path or self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+
+    def follow(self, on_idle=None):
+        calls = []
+
+        def should_stop():
+            calls.append(1)
+            if on_idle is not None and len(calls) == 1:
+                on_idle()
+                return False
+            return True
+
+        return list(follow_lines(self.path, ['роза'], ['азора'], poll_interval=0, should_stop=should_stop))
+
+    def test_resume_from_checkpoint(self):
+        self.assertEqual(['роза цветет'], self.follow())
+        self.append('луна\nроза в саду\n')
+        self.assertEqual(['роза в саду'], self.follow())
+        self.assertEqual([], self.follow())
+
+        inode, offset = load_checkpoint(default_checkpoint_path(self.path))
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(os.path.getsize(self.path), offset)
+
+    def test_new_lines_while_following(self):
+        result = self.follow(on_idle=lambda: self.append('роза'))
+        self.assertEqual(['роза цветет'], result)
+        result = self.follow(on_idle=lambda: self.append(' опять\n'))
+        self.assertEqual(['роза опять'], result)
+
+    def test_rotation(self):
+        self.follow()
+
+        def rotate():
+            self.append('роза перед ротацией')
+            os.rename(self.path, self.path + '.1')
+            self.append('роза после ротации\n')
+
+        self.assertEqual(['роза перед ротацией', 'роза после ротации'], self.follow(on_idle=rotate))
+        self.append('роза снова\n')
+        self.assertEqual(['роза снова'], self.follow())
+
+    def test_truncation(self):
+        self.follow()
+
+        def truncate():
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write('роза\n')
+
+        self.assertEqual(['роза'], self.follow(on_idle=truncate))
+
+    def test_missing_file(self):
+        os.remove(self.path)
+        self.assertEqual([], self.follow())
+        self.append('роза\n')
+        self.assertEqual(['роза'], self.follow())
@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import unittest
+
+from file_filter import filter_lines
+from line_index import LineIndex, build_index, default_index_path, query_index
+
+
+class TestLineIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmp_dir.name, 'data.txt')
+        self.write('роза упала на лапу Азора\r\n\nлуна светит над лесом\rроза цветет в саду\nРОЗА')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'w', encoding='utf-8', newline='') as f:
+            f.write(data)
+
+    def assert_same(self, search, stop):
+        expected = list(filter_lines(self.path, search, stop))
+        self.assertEqual(expected, list(query_index(self.path, search, stop)))
+        return expected
+
+    def test_query(self):
+        build_index(self.path)
+        with LineIndex(self.path) as index:
+            result = list(index.query(['роза'], ['азора']))
+        self.assertEqual(['роза цветет в саду', 'РОЗА'], result)
+
+    def test_query_index_builds_missing_index(self):
+        self.assertFalse(os.path.exists(default_index_path(self.path)))
+        self.assertEqual(['луна светит над лесом'], self.assert_same(['луна'], []))
+        self.assertTrue(os.path.exists(default_index_path(self.path)))
+
+    def test_rebuild_when_stale(self):
+        self.assert_same(['роза'], [])
+        self.write('новая роза\n')
+        os.utime(self.path, ns=(0, 0))
+        with LineIndex(self.path) as index:
+            self.assertTrue(index.is_stale())
+            with self.assertRaises(ValueError):
+                list(index.query(['роза'], []))
+        self.assertEqual(['новая роза'], self.assert_same(['роза'], []))
+
+    def test_rebuild_keeps_open_index_readable(self):
+        build_index(self.path)
+        with LineIndex(self.path) as index:
+            self.write('новая роза\n')
+            build_index(self.path)
+            self.assertEqual({2}, index.lines_with(['луна']))
+        self.assertEqual(['data.txt', 'data.txt.idx'], sorted(os.listdir(self.tmp_dir.name)))
+        with LineIndex(self.path) as index:
+            self.assertEqual(['новая роза'], list(index.query(['роза'], [])))
+
+    def test_not_an_index(self):
+        bad_path = os.path.join(self.tmp_dir.name, 'bad.idx')
+        with open(bad_path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            LineIndex(self.path, bad_path)
+
+    def test_empty_file(self):
+        self.write('')
+        self.assertEqual([], self.assert_same(['роза'], []))
+
+    def test_random_corpus(self):
+        rnd = random.Random(3)
+        vocab = ['роза', 'Луна', 'лес', 'ROSE', 'moon', 'розы', 'а', '123']
+        breaks = ['\n', '\r\n', '\r']
+        self.write(''.join(' '.join(rnd.choices(vocab, k=rnd.randint(0, 5))) + rnd.choice(breaks)
+                           for _ in range(500)))
+        for _ in range(20):
+            self.assert_same(rnd.sample(vocab, 2), rnd.sample(vocab, rnd.randint(0, 2)))
+
+    def test_vocabulary_lookup(self):
+        words = ['0', 'a', 'ab', 'abc', 'b', 'z', 'ä', 'роза', '日本']
+        self.write('\n'.join(words) + '\n')
+        build_index(self.path)
+        with LineIndex(self.path) as index:
+            for line_id, word in enumerate(words):
+                self.assertEqual({line_id}, index.lines_with([word]))
+            self.assertEqual(set(), index.lines_with(['', '!', 'aa', 'abcd', 'яя', '日本語', '￿']))
+
+    def test_query_index_rebuilds_foreign_index(self):
+        with open(default_index_path(self.path), 'wb') as f:
+            f.write(b'\0' * 64)
+        self.assertEqual(['роза цветет в саду', 'РОЗА'], self.assert_same(['роза'], ['азора']))
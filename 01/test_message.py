@@ -1,7 +1,11 @@
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
-from message import predict_message_mood
+from message import predict_message_mood, predict_messages_mood
+from message_model import (DEFAULT_MODEL, CachedModel, ModelRegistry, ScoreCache, SomeModel, enable_score_cache,
+                           registry)
 
 
 class TestPredictMessageMood(unittest.TestCase):
@@ -150,3 +154,177 @@ class TestPredictMessageMood(unittest.TestCase):
     def test_wrong_type(self, mock_predict):  # pylint: disable=unused-argument
         with self.assertRaises(TypeError):
             predict_message_mood(123)
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.factory = mock.Mock(side_effect=SomeModel)
+        self.registry.register("test", self.factory)
+
+    def test_model_created_once(self):
+        first = self.registry.get("test")
+        second = self.registry.get("test")
+        self.assertIs(first, second)
+        self.factory.assert_called_once_with()
+
+    def test_model_created_once_across_threads(self):
+        def slow_factory():
+            time.sleep(0.01)
+            return SomeModel()
+
+        factory = mock.Mock(side_effect=slow_factory)
+        self.registry.register("slow", factory)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            models = list(pool.map(lambda _: self.registry.get("slow"), range(16)))
+        self.assertEqual(1, factory.call_count)
+        self.assertTrue(all(model is models[0] for model in models))
+
+    def test_warm_up(self):
+        self.registry.warm_up()
+        self.factory.assert_called_once_with()
+        self.registry.get("test")
+        self.factory.assert_called_once_with()
+
+    def test_unload_and_reregister(self):
+        first = self.registry.get("test")
+        self.registry.unload("test")
+        self.assertIsNot(first, self.registry.get("test"))
+        self.registry.register("test", SomeModel)
+        self.registry.unload()
+        self.assertIsInstance(self.registry.get("test"), SomeModel)
+
+    def test_unknown_model(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("missing")
+
+    @mock.patch("message.SomeModel.predict")
+    def test_predict_uses_shared_model(self, mock_predict):
+        mock_predict.return_value = 0.5
+        factory = mock.Mock(side_effect=SomeModel)
+        registry.register(DEFAULT_MODEL, factory)
+        try:
+            predict_message_mood("first")
+            predict_message_mood("second")
+        finally:
+            registry.register(DEFAULT_MODEL, SomeModel)
+        factory.assert_called_once_with()
+
+
+class TestPredictMessagesMood(unittest.TestCase):
+
+    messages = ["a", "b", "c", "d", "e", "f"]
+    scores = [0.0, 0.2999, 0.3, 0.8, 0.8001, 1.0]
+    expected = ["неуд", "неуд", "норм", "норм", "отл", "отл"]
+
+    @mock.patch("message.SomeModel.predict_batch")
+    def test_thresholds(self, mock_predict_batch):
+        mock_predict_batch.return_value = self.scores
+        self.assertEqual(self.expected, predict_messages_mood(self.messages))
+        mock_predict_batch.assert_called_once_with(self.messages)
+
+    @mock.patch("message.SomeModel.predict_batch")
+    def test_thresholds_without_numpy(self, mock_predict_batch):
+        mock_predict_batch.return_value = self.scores
+        with mock.patch("message.np", None):
+            self.assertEqual(self.expected, predict_messages_mood(self.messages))
+
+    @mock.patch("message.SomeModel.predict_batch")
+    def test_custom_thresholds(self, mock_predict_batch):
+        mock_predict_batch.return_value = [0.85, 0.5, 0.99, 0.991]
+        result = predict_messages_mood(["a", "b", "c", "d"], 0.8, 0.99)
+        self.assertEqual(["норм", "неуд", "норм", "отл"], result)
+
+    @mock.patch("message.SomeModel.predict_batch")
+    def test_same_as_single_predictions(self, mock_predict_batch):
+        mock_predict_batch.return_value = self.scores
+        with mock.patch("message.SomeModel.predict", side_effect=self.scores):
+            single = [predict_message_mood(message) for message in self.messages]
+        self.assertEqual(single, predict_messages_mood(self.messages))
+
+    def test_real_model(self):
+        result = predict_messages_mood(["hello"] * 100)
+        self.assertEqual(100, len(result))
+        self.assertTrue(set(result) <= {"неуд", "норм", "отл"})
+        self.assertEqual(100, len(SomeModel().predict_batch(["hello"] * 100)))
+
+    def test_empty_batch(self):
+        self.assertEqual([], predict_messages_mood([]))
+
+    def test_wrong_type(self):
+        with self.assertRaises(TypeError):
+            predict_messages_mood(["ok", 123])
+
+
+class TestScoreCache(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.registry.register("test", SomeModel)
+        self.cache = self.registry.enable_cache("test", capacity=2)
+        self.model = self.registry.get("test")
+
+    @mock.patch("message.SomeModel.predict")
+    def test_repeated_message_scored_once(self, mock_predict):
+        mock_predict.return_value = 0.5
+        self.assertEqual(0.5, self.model.predict("spam"))
+        self.assertEqual(0.5, self.model.predict("spam"))
+        mock_predict.assert_called_once_with("spam")
+        self.assertEqual({"size": 1, "hits": 1, "misses": 1}, self.cache.stats())
+
+    @mock.patch("message.SomeModel.predict")
+    def test_thresholds_applied_to_cached_score(self, mock_predict):
+        mock_predict.return_value = 0.5
+        enable_score_cache()
+        try:
+            self.assertEqual("норм", predict_message_mood("spam"))
+            self.assertEqual("отл", predict_message_mood("spam", good_threshold=0.4))
+            self.assertEqual("неуд", predict_message_mood("spam", bad_threshold=0.6))
+        finally:
+            registry.register(DEFAULT_MODEL, SomeModel)
+        mock_predict.assert_called_once_with("spam")
+
+    @mock.patch("message.SomeModel.predict")
+    def test_capacity_evicts_least_recently_used(self, mock_predict):
+        mock_predict.side_effect = [0.1, 0.2, 0.3, 0.4]
+        self.model.predict("a")
+        self.model.predict("b")
+        self.model.predict("a")
+        self.model.predict("c")
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(0.1, self.model.predict("a"))
+        self.assertEqual(0.4, self.model.predict("b"))
+
+    @mock.patch("message.SomeModel.predict")
+    def test_ttl(self, mock_predict):
+        mock_predict.side_effect = [0.1, 0.2]
+        cache = ScoreCache(capacity=10, ttl=5)
+        model = CachedModel(SomeModel(), cache)
+        with mock.patch("message_model.time.monotonic", return_value=100.0):
+            self.assertEqual(0.1, model.predict("a"))
+        with mock.patch("message_model.time.monotonic", return_value=104.0):
+            self.assertEqual(0.1, model.predict("a"))
+        with mock.patch("message_model.time.monotonic", return_value=105.0):
+            self.assertEqual(0.2, model.predict("a"))
+        self.assertEqual({"size": 1, "hits": 1, "misses": 2}, cache.stats())
+
+    @mock.patch("message.SomeModel.predict_batch")
+    def test_batch_scores_only_misses(self, mock_predict_batch):
+        self.cache.capacity = 10
+        mock_predict_batch.side_effect = [[0.1, 0.9], [0.5]]
+        self.assertEqual([0.1, 0.9, 0.1], self.model.predict_batch(["a", "b", "a"]))
+        self.assertEqual([0.9, 0.5], self.model.predict_batch(["b", "c"]))
+        self.assertEqual([mock.call(["a", "b"]), mock.call(["c"])], mock_predict_batch.call_args_list)
+
+    def test_clear_and_delegation(self):
+        self.model.predict("a")
+        self.cache.clear()
+        self.assertEqual({"size": 0, "hits": 0, "misses": 0}, self.cache.stats())
+        self.assertEqual(3, self.model.mes_len("abc"))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            ScoreCache(capacity=0)
+        with self.assertRaises(ValueError):
+            ScoreCache(ttl=0)
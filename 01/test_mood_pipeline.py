@@ -0,0 +1,44 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mood_pipeline import _chunks, _init_worker, _score_chunk, score_stream
+
+
+class TestMoodPipeline(unittest.TestCase):
+
+    def test_chunks(self):
+        lines = io.StringIO("a\nb\r\nc\nd\ne")
+        self.assertEqual([["a", "b"], ["c", "d"], ["e"]], list(_chunks(lines, 2)))
+        self.assertEqual([], list(_chunks([], 2)))
+
+    @mock.patch("message.SomeModel.predict_batch", return_value=[0.1, 0.5, 0.9])
+    def test_score_chunk(self, mock_predict_batch):
+        _init_worker("default")
+        self.assertEqual(["неуд", "норм", "отл"], _score_chunk(["a", "b", "c"], 0.3, 0.8, "default"))
+        mock_predict_batch.assert_called_once_with(["a", "b", "c"])
+
+    def test_score_stream_keeps_input_order(self):
+        lines = [f"message {i}\n" for i in range(500)]
+        result = list(score_stream(lines, workers=2, chunk_size=7))
+        self.assertEqual([line.rstrip("\n") for line in lines], [message for message, _ in result])
+        self.assertTrue({mood for _, mood in result} <= {"неуд", "норм", "отл"})
+
+    def test_thresholds(self):
+        result = list(score_stream(["a", "b"], bad_threshold=2, workers=1))
+        self.assertEqual([("a", "неуд"), ("b", "неуд")], result)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src, dst = os.path.join(tmp_dir, "in.txt"), os.path.join(tmp_dir, "out.txt")
+            with open(src, "w", encoding="utf-8") as f:
+                f.write("привет\nпока\n")
+            script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mood_pipeline.py")
+            subprocess.run([sys.executable, script, src, "-o", dst, "-w", "1", "--bad", "-1", "--good", "-1"],
+                           check=True)
+            with open(dst, encoding="utf-8") as f:
+                self.assertEqual("отл\tпривет\nотл\tпока\n", f.read())
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from message_model import DEFAULT_MODEL, SomeModel, registry
+from mood_server import MoodBatcher, _percentile, run_load
+
+
+class TestMoodBatcher(unittest.IsolatedAsyncioTestCase):
+
+    @mock.patch("message.SomeModel.predict_batch")
+    async def test_requests_coalesced_into_batches(self, mock_predict_batch):
+        mock_predict_batch.side_effect = lambda messages: [0.1 if m == "bad" else 0.9 for m in messages]
+        async with MoodBatcher(max_batch_size=4, max_wait=1) as batcher:
+            result = await asyncio.gather(*(batcher.predict_message_mood(m) for m in ["bad", "good"] * 4))
+        self.assertEqual(["неуд", "отл"] * 4, result)
+        self.assertEqual(2, batcher.batches)
+        self.assertEqual([4, 4], [len(c.args[0]) for c in mock_predict_batch.call_args_list])
+
+    @mock.patch("message.SomeModel.predict_batch", return_value=[0.5])
+    async def test_max_wait_flushes_partial_batch(self, mock_predict_batch):
+        async with MoodBatcher(max_batch_size=100, max_wait=0.01) as batcher:
+            self.assertEqual("отл", await batcher.predict_message_mood("hi", good_threshold=0.4))
+        mock_predict_batch.assert_called_once_with(["hi"])
+
+    @mock.patch("message.SomeModel.predict_batch", side_effect=RuntimeError("model failed"))
+    async def test_model_error_propagates(self, _):
+        async with MoodBatcher(max_wait=0) as batcher:
+            with self.assertRaisesRegex(RuntimeError, "model failed"):
+                await batcher.predict_message_mood("hi")
+
+    async def test_close_is_idempotent_and_stops_requests(self):
+        batcher = MoodBatcher()
+        batcher.start()
+        await batcher.close()
+        await batcher.close()
+        with self.assertRaises(RuntimeError):
+            await batcher.predict_score("hi")
+
+    @mock.patch("message.SomeModel.predict_batch")
+    async def test_close_cancels_pending(self, mock_predict_batch):
+        release = threading.Event()
+        mock_predict_batch.side_effect = lambda messages: release.wait(5) and [0.5] * len(messages)
+        batcher = MoodBatcher(max_batch_size=2, max_wait=0)
+        batcher.start()
+        in_flight = asyncio.ensure_future(batcher.predict_score("taken by the worker"))
+        while not mock_predict_batch.called:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(batcher.predict_score("still queued"))
+        await asyncio.sleep(0)
+        try:
+            await batcher.close()
+            for future in (in_flight, queued):
+                with self.assertRaises(asyncio.CancelledError):
+                    await asyncio.wait_for(future, 1)
+        finally:
+            release.set()
+
+    async def test_close_cancels_partially_collected_batch(self):
+        batcher = MoodBatcher(max_batch_size=10, max_wait=5)
+        batcher.start()
+        collecting = asyncio.ensure_future(batcher.predict_score("hi"))
+        await asyncio.sleep(0.01)
+        await batcher.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(collecting, 1)
+
+    async def test_wrong_type(self):
+        async with MoodBatcher() as batcher:
+            with self.assertRaises(TypeError):
+                await batcher.predict_score(123)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            MoodBatcher(max_batch_size=0)
+        with self.assertRaises(ValueError):
+            MoodBatcher(max_wait=-1)
+
+    async def test_run_load(self):
+        registry.register(DEFAULT_MODEL, SomeModel)
+        async with MoodBatcher(max_batch_size=16, max_wait=0.001) as batcher:
+            stats = await run_load(batcher, requests=200, concurrency=20)
+        self.assertEqual(200, stats["requests"])
+        self.assertLess(stats["batches"], 200)
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        self.assertGreater(stats["throughput"], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, _percentile(values, 50))
+        self.assertEqual(99, _percentile(values, 99))
+        self.assertEqual(1, _percentile([1], 99))
@@ -0,0 +1,176 @@
+import argparse
+import dataclasses as dc
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from json_handler import JsonTokenMatcher, process_json, process_json_stream, process_ndjson
+
+TOKEN = 'needle'
+
+# Same report layout as 01/filter_benchmark.py on purpose, so results of the
+# two suites can be read side by side; the directories share no code.
+# pylint: disable=duplicate-code
+
+
+@dc.dataclass(slots=True)
+class DocSpec:  # pylint: disable=too-few-public-methods
+    docs: int = 2_000
+    keys: int = 20
+    required_keys: int = 5
+    words_per_value: int = 20
+    vocabulary: int = 1_000
+    token_density: float = 0.05
+    seed: int = 42
+
+
+@dc.dataclass(slots=True)
+class BenchResult:  # pylint: disable=too-few-public-methods
+    mode: str
+    seconds: float
+    docs_per_sec: float
+    mb_per_sec: float
+    peak_memory_bytes: int
+    live_blocks_after_run: int
+    matches: int
+# pylint: enable=duplicate-code
+
+
+def generate_documents(spec: DocSpec) -> list[str]:
+    rnd = random.Random(spec.seed)
+    vocab = [f'w{i}' for i in range(spec.vocabulary)]
+    docs = []
+    for _ in range(spec.docs):
+        doc = {}
+        for key_no in range(spec.keys):
+            words = [TOKEN.upper() if rnd.random() < spec.token_density else rnd.choice(vocab)
+                     for _ in range(spec.words_per_value)]
+            doc[f'key{key_no}'] = ' '.join(words)
+        docs.append(json.dumps(doc))
+    return docs
+
+
+def required_keys(spec: DocSpec) -> list[str]:
+    return [f'key{key_no}' for key_no in range(spec.required_keys)]
+
+
+def _run_process_json(docs, keys):
+    matches = []
+    for doc in docs:
+        process_json(doc, keys, [TOKEN], lambda key, token: matches.append(token))
+    return len(matches)
+
+
+def _run_aggregate(docs, keys):
+    matches = []
+    for doc in docs:
+        process_json(doc, keys, [TOKEN], matches.append, aggregate=True)
+    return sum(len(m) for m in matches)
+
+
+def _run_matcher(docs, keys):
+    matcher = JsonTokenMatcher(keys, [TOKEN])
+    return sum(len(matcher.match(doc)) for doc in docs)
+
+
+def _run_matcher_collect(docs, keys):
+    matcher = JsonTokenMatcher(keys, [TOKEN])
+    result = None
+    for doc in docs:
+        result = matcher.collect(doc, into=result)
+    return len(result) if result is not None else 0
+
+
+def _run_stream(docs, keys):
+    matches = []
+    for doc in docs:
+        process_json_stream(io.StringIO(doc), keys, [TOKEN], lambda key, token: matches.append(token))
+    return len(matches)
+
+
+def _run_ndjson(docs, keys):
+    matches = []
+    process_ndjson(docs, keys, [TOKEN], lambda key, token: matches.append(token))
+    return len(matches)
+
+
+MODES = {
+    'process_json': _run_process_json,
+    'aggregate': _run_aggregate,
+    'matcher': _run_matcher,
+    'matcher_collect': _run_matcher_collect,
+    'stream': _run_stream,
+    'ndjson': _run_ndjson,
+}
+
+
+def measure(mode: str, docs: list[str], keys: list[str], repeat: int = 3) -> BenchResult:
+    size = sum(len(doc.encode('utf-8')) for doc in docs)
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matches = MODES[mode](docs, keys)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # Separate pass: tracemalloc distorts timings. Worker processes of the
+    # ndjson mode are not traced.
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    MODES[mode](docs, keys)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Blocks allocated by the run that are still alive after it (caches,
+    # leaks). tracemalloc has no count of blocks that were allocated and
+    # freed again; peak_memory_bytes is what bounds those.
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return BenchResult(mode, seconds, len(docs) / seconds, size / seconds / 2 ** 20, peak, blocks, matches)
+
+
+def run(spec: DocSpec, modes: list[str], repeat: int = 3) -> dict:
+    docs = generate_documents(spec)
+    keys = required_keys(spec)
+    results = [measure(mode, docs, keys, repeat) for mode in modes]
+    return {
+        'python': sys.version.split()[0],
+        'documents': dc.asdict(spec) | {'bytes': sum(len(doc.encode('utf-8')) for doc in docs)},
+        'results': [dc.asdict(result) for result in results],
+    }
+
+
+SPEC_HELP = {
+    'docs': "Число документов",
+    'keys': "Ключей в документе",
+    'required_keys': "Из них искомых",
+    'words_per_value': "Слов в значении",
+    'vocabulary': "Размер словаря",
+    'token_density': "Доля искомых токенов",
+}
+
+
+def _cli() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    p.add_argument("--repeat", type=int, default=3, help="Повторов, берётся лучший")
+    p.add_argument("-o", "--output", type=argparse.FileType('w', encoding='utf-8'), default=sys.stdout,
+                   help="Файл для JSON-отчёта (по умолчанию stdout)")
+    for field in dc.fields(DocSpec):
+        p.add_argument("--" + field.name.replace('_', '-'), type=type(field.default), default=field.default,
+                       help=SPEC_HELP.get(field.name))
+    return p.parse_args()
+
+
+def main() -> None:
+    a = _cli()
+    spec = DocSpec(**{field.name: getattr(a, field.name) for field in dc.fields(DocSpec)})
+    json.dump(run(spec, a.modes, a.repeat), a.output, indent=2)
+    a.output.write('\n')
+    if a.output is not sys.stdout:
+        a.output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,440 @@
+import codecs
+import dataclasses as dc
 import json
-from typing import Callable
+import os
+import re
+from array import array
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from itertools import islice
+from typing import IO, Callable, Iterable
+
+STREAM_CHUNK_SIZE = 64 * 1024
+NDJSON_CHUNK_SIZE = 1000
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_SCALAR = re.compile(r'[^,}\]\s]*')
+
+
+def _validate(
+    required_keys: list[str] | None,
+    tokens: list[str] | None,
+    callback: Callable[[str, str], None] | None,
+) -> None:
+    if required_keys is not None and not all(isinstance(key, str) for key in required_keys):
+        raise TypeError("All required_keys must be strings")
+
+    if tokens is not None and not all(isinstance(token, str) for token in tokens):
+        raise TypeError("All tokens must be strings")
+
+    if callback is not None and not callable(callback):
+        raise TypeError("callback must be callable")
+
+
+@dc.dataclass(slots=True)
+class JsonMatches:
+    keys: tuple[str, ...]
+    key_ids: array = dc.field(default_factory=lambda: array('I'))
+    tokens: list[str] = dc.field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def pairs(self):
+        keys = self.keys
+        return ((keys[key_id], token) for key_id, token in zip(self.key_ids, self.tokens))
+
+    def counts(self) -> dict[str, int]:
+        return {self.keys[key_id]: count for key_id, count in Counter(self.key_ids).items()}
 
 
 def process_json(
     json_str: str,
     required_keys: list[str] | None = None,
     tokens: list[str] | None = None,
-    callback: Callable[[str, str], None] | None = None,
+    callback: Callable[[str, str], None] | Callable[[JsonMatches], None] | None = None,
+    aggregate: bool = False,
 ) -> None:
     if not isinstance(json_str, str):
         raise TypeError("json_str must be a string")
 
-    if required_keys is not None and not all(isinstance(key, str) for key in required_keys):
-        raise TypeError("All required_keys must be strings")
+    _validate(required_keys, tokens, callback)
 
-    if tokens is not None and not all(isinstance(token, str) for token in tokens):
-        raise TypeError("All tokens must be strings")
+    if required_keys is None or tokens is None or callback is None:
+        return
 
-    if callback is not None and not callable(callback):
-        raise TypeError("callback must be callable")
+    matcher = _cached_matcher(tuple(required_keys), tuple(tokens))
+    if aggregate:
+        callback(matcher.collect(json_str))
+        return
+    for key, input_token in matcher.match(json_str):
+        callback(key, input_token)
+
+
+_PATH_SEGMENT = re.compile(r"""(\.?)([^.\[]+)|\[(\d+|\*)\]|\[(['"])(.*?)\4\]""")
+_ROOT = re.compile(r'\$(?=[.\[]|$)')
+_WILDCARD = None
+
+
+class _PathNode:  # pylint: disable=too-few-public-methods
+    __slots__ = ('children', 'wildcard', 'path_ids')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _PathNode] = {}
+        self.wildcard: _PathNode | None = None
+        self.path_ids: list[int] = []
+
+
+def _split_path(path: str) -> list[str | None]:
+    # "$" is the root only when a path follows it, so "$ref" stays a key.
+    pos = 1 if _ROOT.match(path) else 0
+    segments = []
+    while pos < len(path):
+        found = _PATH_SEGMENT.match(path, pos)
+        if found is None or (pos == 0 and path.startswith('.')):
+            # Not a path: an ordinary top-level key, as before paths existed.
+            return [path]
+        dot, name, index, _, quoted = found.groups()
+        if name is not None:
+            # A bare "*" key is a key; only ".*" is a wildcard.
+            segments.append(_WILDCARD if dot and name == '*' else name)
+        elif index is not None:
+            segments.append(_WILDCARD if index == '*' else index)
+        else:
+            segments.append(quoted)
+        pos = found.end()
+    return segments or [path]
+
+
+def _compile_paths(paths: list[list[str | None]]) -> _PathNode:
+    root = _PathNode()
+    for path_id, path in enumerate(paths):
+        node = root
+        for segment in path:
+            if segment is _WILDCARD:
+                node.wildcard = node.wildcard or _PathNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _PathNode())
+        node.path_ids.append(path_id)
+    return root
+
+
+def _walk(value, node: _PathNode):
+    if node.path_ids and isinstance(value, str):
+        for path_id in node.path_ids:
+            yield path_id, value
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((str(index), item) for index, item in enumerate(value))
+    else:
+        return
+    children, wildcard = node.children, node.wildcard
+    if not children and wildcard is None:
+        return
+    # Only branches that can still lead to a required path are descended into.
+    for key, item in items:
+        child = children.get(key)
+        if child is not None:
+            yield from _walk(item, child)
+        if wildcard is not None:
+            yield from _walk(item, wildcard)
+
+
+class JsonTokenMatcher:
+
+    def __init__(self, required_keys: Iterable[str], tokens: Iterable[str]) -> None:
+        required_keys, tokens = list(required_keys), list(tokens)
+        _validate(required_keys, tokens, None)
+        self.required_keys = frozenset(required_keys)
+        self.token_set = frozenset(token.upper() for token in tokens)
+        self.keys = tuple(dict.fromkeys(required_keys))
+        paths = [_split_path(key) for key in self.keys]
+        self._root = _compile_paths(paths)
+        self.top_level_keys = {}
+        self.nested_keys = []
+        for key, path in zip(self.keys, paths):
+            if len(path) == 1 and path[0] is not _WILDCARD:
+                self.top_level_keys.setdefault(path[0], []).append(key)
+            else:
+                self.nested_keys.append(key)
+
+    def match_value(self, key: str, value: str) -> list[tuple[str, str]]:
+        token_set = self.token_set
+        return [(key, token) for token in value.split() if token.upper() in token_set]
+
+    def match_document(self, data: dict) -> list[tuple[str, str]]:
+        matches = []
+        keys = self.keys
+        for path_id, value in _walk(data, self._root):
+            matches.extend(self.match_value(keys[path_id], value))
+        return matches
+
+    def match(self, json_str: str) -> list[tuple[str, str]]:
+        if not isinstance(json_str, str):
+            raise TypeError("json_str must be a string")
+        return self.match_document(json.loads(json_str))
+
+    def collect_document(self, data: dict, into: JsonMatches | None = None) -> JsonMatches:
+        result = JsonMatches(self.keys) if into is None else into
+        token_set = self.token_set
+        for path_id, value in _walk(data, self._root):
+            matched = [token for token in value.split() if token.upper() in token_set]
+            result.tokens.extend(matched)
+            result.key_ids.extend([path_id] * len(matched))
+        return result
+
+    def collect(self, json_str: str, into: JsonMatches | None = None) -> JsonMatches:
+        if not isinstance(json_str, str):
+            raise TypeError("json_str must be a string")
+        return self.collect_document(json.loads(json_str), into)
+
+
+@lru_cache(maxsize=128)
+def _cached_matcher(required_keys: tuple[str, ...], tokens: tuple[str, ...]) -> JsonTokenMatcher:
+    # process_json is called once per document, usually with the same keys.
+    return JsonTokenMatcher(required_keys, tokens)
+
+
+# Pull-based JSON scanner over a text or byte stream. Only the part of the
+# document still being looked at stays in the buffer, so skipped values never
+# have to fit in memory.
+class _StreamReader:
+
+    def __init__(self, stream: IO, chunk_size: int) -> None:
+        self._read = stream.read
+        self._chunk_size = chunk_size
+        self._decoder = None
+        self.buf = ''
+        self.pos = 0
+        self.offset = 0
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, '', self.offset + self.pos)
+
+    def _fill(self) -> bool:
+        chunk = self._read(self._chunk_size)
+        if not chunk:
+            if self._decoder is not None:
+                self._decoder.decode(b'', final=True)
+            return False
+        if isinstance(chunk, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = self._decoder.decode(chunk)
+        self.buf += chunk
+        return True
+
+    def _discard(self, count: int) -> None:
+        self.offset += count
+        self.buf = self.buf[count:]
+        self.pos = max(0, self.pos - count)
+
+    def compact(self) -> None:
+        # Dropping the consumed prefix copies the rest of the buffer, so it is
+        # only worth doing once that prefix is about a chunk long.
+        if self.pos >= self._chunk_size:
+            self._discard(self.pos)
+
+    def _backslashes_before(self, start: int, end: int) -> int:
+        i = end
+        while i > start and self.buf[i - 1] == '\\':
+            i -= 1
+        return end - i
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            self._discard(self.pos)
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f"Expecting {char!r}")
+        self.pos += 1
+
+    def read_string(self, keep: bool) -> str | None:
+        self.expect('"')
+        start = search = self.pos
+        parts = []
+        while True:
+            end = self.buf.find('"', search)
+            if end != -1 and self._backslashes_before(start, end) % 2 == 0:
+                break
+            if end != -1:
+                search = end + 1
+                continue
+            # Only trailing backslashes matter for the quotes still to come.
+            # The rest is moved out of the buffer, so appending the next chunk
+            # does not copy the whole value again.
+            cut = len(self.buf) - self._backslashes_before(start, len(self.buf))
+            if keep:
+                parts.append(self.buf[start:cut])
+            self._discard(cut)
+            start, search = 0, len(self.buf)
+            if not self._fill():
+                raise self.error("Unterminated string")
+        self.pos = end + 1
+        if not keep:
+            return None
+        parts.append(self.buf[start:end])
+        return json.loads('"' + ''.join(parts) + '"')
+
+    def read_scalar(self):
+        self.peek()
+        while (end := _SCALAR.match(self.buf, self.pos).end()) == len(self.buf) and self._fill():
+            pass
+        try:
+            value = json.loads(self.buf[self.pos:end])
+        except json.JSONDecodeError:
+            raise self.error("Expecting value") from None
+        self.pos = end
+        return value
+
+    def skip_value(self) -> None:
+        char = self.peek()
+        if char == '"':
+            self.read_string(keep=False)
+            return
+        if char not in ('{', '['):
+            self.read_scalar()
+            return
+
+        depth = 0
+        while True:
+            found = _STRUCTURAL.search(self.buf, self.pos)
+            if found is None:
+                self._discard(len(self.buf))
+                if not self._fill():
+                    raise self.error("Unterminated container")
+                continue
+            self.pos = found.start()
+            if found.group() == '"':
+                self.read_string(keep=False)
+                continue
+            self.pos += 1
+            depth += 1 if found.group() in '{[' else -1
+            if depth == 0:
+                return
+
+
+def _iter_top_level_strings(reader: _StreamReader, required_keys):
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.read_string(keep=True)
+            reader.expect(':')
+            if key in required_keys and reader.peek() == '"':
+                yield key, reader.read_string(keep=True)
+            else:
+                reader.skip_value()
+            reader.compact()
+            if reader.peek() == ',':
+                reader.pos += 1
+                continue
+            reader.expect('}')
+            break
+    if reader.peek() != '':
+        raise reader.error("Extra data")
+
+
+def process_json_stream(
+    stream_or_path: IO | str | os.PathLike,
+    required_keys: list[str] | None = None,
+    tokens: list[str] | None = None,
+    callback: Callable[[str, str], None] | None = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> None:
+    _validate(required_keys, tokens, callback)
 
     if required_keys is None or tokens is None or callback is None:
         return
 
-    data = json.loads(json_str)
-    token_set = set(token.upper() for token in tokens)
+    if isinstance(stream_or_path, (str, os.PathLike)):
+        with open(stream_or_path, 'rb') as f:
+            process_json_stream(f, required_keys, tokens, callback, chunk_size)
+        return
+
+    matcher = JsonTokenMatcher(required_keys, tokens)
+    if matcher.nested_keys:
+        raise ValueError(f"Only top-level keys can be streamed: {', '.join(matcher.nested_keys)}")
+    reader = _StreamReader(stream_or_path, chunk_size)
+    for key, value in _iter_top_level_strings(reader, matcher.top_level_keys):
+        for name in matcher.top_level_keys[key]:
+            for match in matcher.match_value(name, value):
+                callback(*match)
+
+
+def _match_ndjson_chunk(lines: list[str], matcher: JsonTokenMatcher) -> list[tuple[str, str]]:
+    matches = []
+    for line in lines:
+        if line.strip():
+            matches.extend(matcher.match(line))
+    return matches
+
+
+def _ndjson_chunks(lines: Iterable[str], chunk_size: int):
+    lines = iter(lines)
+    while chunk := list(islice(lines, chunk_size)):
+        yield chunk
+
+
+def _scan_ndjson_ordered(pool, chunks, matcher: JsonTokenMatcher, workers: int):
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_match_ndjson_chunk, chunk, matcher))
+        if len(pending) >= 2 * workers:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def _scan_ndjson_as_completed(pool, chunks, matcher: JsonTokenMatcher, workers: int):
+    chunks = iter(chunks)
+    pending = set()
+    while True:
+        for chunk in islice(chunks, 2 * workers - len(pending)):
+            pending.add(pool.submit(_match_ndjson_chunk, chunk, matcher))
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+
+def process_ndjson(  # pylint: disable=too-many-arguments
+    path_or_lines: str | os.PathLike | Iterable[str],
+    required_keys: list[str] | None = None,
+    tokens: list[str] | None = None,
+    callback: Callable[[str, str], None] | None = None,
+    workers: int | None = None,
+    chunk_size: int = NDJSON_CHUNK_SIZE,
+    ordered: bool = True,
+) -> None:
+    _validate(required_keys, tokens, callback)
+
+    if required_keys is None or tokens is None or callback is None:
+        return
+
+    if isinstance(path_or_lines, (str, os.PathLike)):
+        with open(path_or_lines, 'r', encoding='utf-8') as f:
+            process_ndjson(f, required_keys, tokens, callback, workers, chunk_size, ordered)
+        return
 
-    for key, value in data.items():
-        if key in required_keys:
-            input_tokens = value.split()
-            for input_token in input_tokens:
-                if input_token.upper() in token_set:
-                    callback(key, input_token)
+    matcher = JsonTokenMatcher(required_keys, tokens)
+    workers = workers or os.cpu_count() or 1
+    scan = _scan_ndjson_ordered if ordered else _scan_ndjson_as_completed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for key, input_token in scan(pool, _ndjson_chunks(path_or_lines, chunk_size), matcher, workers):
+            callback(key, input_token)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,23 @@
+import asyncio
+import bisect
+import dataclasses as dc
+import inspect
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from functools import wraps
+from typing import Final
+
+_LOGGER_NAME: Final[str] = "retry_deco"
+LOG = logging.getLogger(_LOGGER_NAME)
 
 
 def _format_log_message(func, args, kwargs, attempt, result=None, exception=None):  # pylint: disable=too-many-arguments
-    message_parts = [f'\nrun "{func.__name__}"']
+    message_parts = [f'run "{func.__name__}"']
 
     if args:
         message_parts.append(f'with positional args = {args}')
@@ -22,47 +37,576 @@ def _format_log_message(func, args, kwargs, attempt, result=None, exception=None
     return ' '.join(message_parts)
 
 
-def retry_deco(retries=1, expected_exceptions=None):
+class _LogMessage:  # pylint: disable=too-few-public-methods
+    __slots__ = ("func", "args", "kwargs", "attempt", "result", "exception")
+
+    def __init__(self, func, args, kwargs, attempt, result, exception):  # pylint: disable=too-many-arguments
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.attempt = attempt
+        self.result = result
+        self.exception = exception
+
+    def __str__(self):
+        return _format_log_message(self.func, self.args, self.kwargs, self.attempt, self.result, self.exception)
+
+
+def _log_attempt(logger, sample_rate, func, args, kwargs, attempt, result=None,  # pylint: disable=too-many-arguments
+                 exception=None):
+    level = logging.DEBUG if exception is None else logging.WARNING
+    # Checked before anything is built: a disabled level costs one call.
+    if not logger.isEnabledFor(level):
+        return
+    if exception is None and sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, "%s", _LogMessage(func, args, kwargs, attempt, result, exception))
+
+
+def _check_seconds(name, value, allow_none=True):
+    if value is None and allow_none:
+        return
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"{name} must be a number")
+    if value < 0:
+        raise ValueError(f"{name} cannot be negative")
+
+
+def _retry_delay(attempt, started, backoff, max_delay, deadline):  # pylint: disable=too-many-arguments
+    if backoff == 0:
+        cap = 0.0
+    else:
+        # The exponent is capped: 2 ** 1024 no longer fits in a float, and
+        # 2 ** 64 seconds is past any delay worth waiting for anyway.
+        cap = backoff * 2 ** min(attempt - 1, 64)
+    if max_delay is not None:
+        cap = min(cap, max_delay)
+    # Full jitter: a uniformly random delay in [0, cap].
+    delay = random.uniform(0, cap) if cap > 0 else 0.0
+    if deadline is not None and time.monotonic() - started + delay > deadline:
+        return None
+    return delay
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class RetryBudget:
+    def __init__(self, ratio=0.1, max_tokens=10):
+        _check_seconds("ratio", ratio, allow_none=False)
+        _check_seconds("max_tokens", max_tokens, allow_none=False)
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def record_call(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate=0.5, window=10.0, min_calls=10,  # pylint: disable=too-many-arguments
+                 reset_timeout=30.0, half_open_probes=1):
+        if isinstance(failure_rate, bool) or not isinstance(failure_rate, (int, float)) \
+                or not 0 < failure_rate <= 1:
+            raise ValueError("failure_rate must be in (0, 1]")
+        _check_seconds("window", window, allow_none=False)
+        _check_seconds("reset_timeout", reset_timeout, allow_none=False)
+        if not isinstance(min_calls, int) or min_calls < 1:
+            raise ValueError("min_calls must be a positive integer")
+        if not isinstance(half_open_probes, int) or half_open_probes < 1:
+            raise ValueError("half_open_probes must be a positive integer")
+
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._state = self.CLOSED
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _evict(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _reset(self, state):
+        self._state = state
+        self._outcomes.clear()
+        self._failures = 0
+        self._probes = 0
+
+    def allow(self):
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._reset(self.CLOSED)
+                return
+            self._record(time.monotonic(), False)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.HALF_OPEN:
+                self._reset(self.OPEN)
+                self._opened_at = now
+                return
+            self._record(now, True)
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_rate * len(self._outcomes):
+                self._reset(self.OPEN)
+                self._opened_at = now
+
+    def release(self):
+        # An attempt that never finished (cancelled, interrupted) says nothing
+        # about the callee, but a half-open probe slot must be given back.
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _record(self, now, failed):
+        if self._state != self.CLOSED:
+            return
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        self._evict(now)
+
+
+LATENCY_BUCKETS: Final[tuple] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ATTEMPT_BUCKETS: Final[tuple] = (1, 2, 3, 5, 10)
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self):
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip((*(f"{bound:g}" for bound in self.bounds), "+Inf"), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "sum": self.total, "count": self.count}
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(value):
+    # repr round-trips floats; whole numbers keep the integer form of counts.
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class RetryMetrics:
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, attempt_buckets=ATTEMPT_BUCKETS):
+        for name, bounds in (("latency_buckets", latency_buckets), ("attempt_buckets", attempt_buckets)):
+            if not bounds or list(bounds) != sorted(set(bounds)):
+                raise ValueError(f"{name} must be non-empty and strictly increasing")
+        self.latency_buckets = tuple(latency_buckets)
+        self.attempt_buckets = tuple(attempt_buckets)
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name):
+        entry = self._functions.get(name)
+        if entry is None:
+            entry = self._functions[name] = (
+                _Histogram(self.latency_buckets), _Histogram(self.attempt_buckets), {}
+            )
+        return entry
+
+    def observe_call(self, name, seconds, attempts):
+        with self._lock:
+            latency, attempt_hist, _ = self._entry(name)
+            latency.observe(seconds)
+            attempt_hist.observe(attempts)
+
+    def observe_exception(self, name, exception):
+        with self._lock:
+            exceptions = self._entry(name)[2]
+            exception_name = type(exception).__name__
+            exceptions[exception_name] = exceptions.get(exception_name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._functions.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "latency_seconds": latency.snapshot(),
+                    "attempts": attempts.snapshot(),
+                    "exceptions": dict(exceptions),
+                }
+                for name, (latency, attempts, exceptions) in self._functions.items()
+            }
+
+    def to_prometheus(self, prefix="retry_deco"):
+        snapshot = self.snapshot()
+        lines = []
+        for metric, key in ((f"{prefix}_call_seconds", "latency_seconds"), (f"{prefix}_attempts", "attempts")):
+            lines.append(f"# TYPE {metric} histogram")
+            for name, entry in snapshot.items():
+                function = f'function="{_label(name)}"'
+                for bound, count in entry[key]["buckets"].items():
+                    lines.append(f'{metric}_bucket{{{function},le="{bound}"}} {count}')
+                lines.append(f"{metric}_sum{{{function}}} {_sample(entry[key]['sum'])}")
+                lines.append(f"{metric}_count{{{function}}} {entry[key]['count']}")
+        lines.append(f"# TYPE {prefix}_exceptions_total counter")
+        for name, entry in snapshot.items():
+            for exception_name, count in sorted(entry["exceptions"].items()):
+                lines.append(f'{prefix}_exceptions_total{{function="{_label(name)}",'
+                             f'exception="{_label(exception_name)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _hedge_seconds(hedge_delay):
+    delay = hedge_delay() if callable(hedge_delay) else hedge_delay
+    _check_seconds("hedge_delay", delay, allow_none=False)
+    return delay
+
+
+class _HedgePool:  # pylint: disable=too-few-public-methods
+    # One pool per decorated function, created on the first hedged call, so
+    # threads are reused instead of started for every call. It has no worker
+    # limit: an attempt never queues behind other calls, so the hedge timer
+    # measures the call itself, concurrent callers are not capped, a slow
+    # loser does not starve new calls and a function that calls itself does
+    # not deadlock. Idle threads are reused before new ones are started.
+
+    def __init__(self, name):
+        self._name = name
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=sys.maxsize,
+                                                    thread_name_prefix=f"retry_deco_hedge[{self._name}]")
+        return self._pool.submit(func, *args, **kwargs)
+
+
+def _call_hedged(pool, func, args, kwargs, hedge_delay):  # pylint: disable=too-many-arguments
+    # The primary also runs in the pool: a call made on the caller's thread
+    # could not be abandoned, so a faster hedge could never be returned.
+    # Threads cannot be cancelled either: the loser finishes in the
+    # background and its result is dropped.
+    futures = [pool.submit(func, *args, **kwargs)]
+    done, _ = wait(futures, timeout=_hedge_seconds(hedge_delay))
+    if not done:
+        futures.append(pool.submit(func, *args, **kwargs))
+    errors = []
+    for future in as_completed(futures):
+        if future.exception() is None:
+            for other in futures:
+                other.cancel()
+            return future.result()
+        errors.append(future.exception())
+    raise errors[0]
+
+
+async def _acall_hedged(func, args, kwargs, hedge_delay):
+    tasks = [asyncio.ensure_future(func(*args, **kwargs))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=_hedge_seconds(hedge_delay))
+        if not done:
+            tasks.append(asyncio.ensure_future(func(*args, **kwargs)))
+        error = None
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                return await next_done
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = error or e
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+
+@dc.dataclass(frozen=True, slots=True)
+class _RetryPolicy:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    retries: int
+    expected_exceptions: tuple
+    backoff: float
+    max_delay: float | None
+    deadline: float | None
+    logger: logging.Logger
+    sample_rate: float
+    budget: RetryBudget | None
+    breaker: CircuitBreaker | None
+    metrics: RetryMetrics | None
+
+
+class _RetryCall:  # pylint: disable=too-many-instance-attributes
+    # Bookkeeping of one decorated call, shared by _retry and _aretry: they
+    # only differ in how they call the function and sleep.
+    __slots__ = ("policy", "func", "args", "kwargs", "attempt", "last_exception", "started", "timer")
+
+    def __init__(self, policy, func, args, kwargs, attempt=0):  # pylint: disable=too-many-arguments
+        self.policy = policy
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.attempt = attempt
+        self.last_exception = None
+        self.started = time.monotonic()
+        self.timer = time.perf_counter() if policy.metrics is not None else 0.0
+        if policy.budget is not None:
+            policy.budget.record_call()
+
+    def delays(self):
+        # How long to sleep before each attempt. Stops early once the
+        # deadline or the shared retry budget runs out.
+        policy = self.policy
+        for attempt in range(self.attempt + 1, policy.retries + 1):
+            if attempt == 1:
+                yield 0.0
+                continue
+            delay = _retry_delay(attempt - 1, self.started, policy.backoff, policy.max_delay, policy.deadline)
+            if delay is None or (policy.budget is not None and not policy.budget.try_spend()):
+                return
+            yield delay
+
+    def begin(self):
+        breaker = self.policy.breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("circuit breaker is open") from self.last_exception
+        self.attempt += 1
+
+    def _log(self, result=None, exception=None):
+        _log_attempt(self.policy.logger, self.policy.sample_rate, self.func, self.args, self.kwargs, self.attempt,
+                     result=result, exception=exception)
+
+    def succeeded(self, result):
+        if self.policy.breaker is not None:
+            self.policy.breaker.record_success()
+        self._log(result=result)
+        return result
+
+    def failed(self, exception, expected=False):
+        breaker, metrics = self.policy.breaker, self.policy.metrics
+        if breaker is not None:
+            # The callee answered; an expected error says nothing about its health.
+            if expected:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        if metrics is not None:
+            metrics.observe_exception(_metric_name(self.func), exception)
+        self._log(exception=exception)
+        self.last_exception = exception
+
+    def interrupted(self):
+        # Cancelled or interrupted: neither a success nor a failure, but a
+        # half-open probe slot has to be given back.
+        if self.policy.breaker is not None:
+            self.policy.breaker.release()
+
+    def give_up(self):
+        if self.policy.retries == 0:
+            raise ValueError("Function not attempted (retries=0)")
+        if self.last_exception is not None:
+            raise self.last_exception
+
+    def close(self):
+        if self.policy.metrics is not None:
+            self.policy.metrics.observe_call(_metric_name(self.func), time.perf_counter() - self.timer, self.attempt)
+
+
+def _retry(call, hedge_pool, hedge_delay):
+    func, args, kwargs = call.func, call.args, call.kwargs
+    try:
+        for delay in call.delays():
+            if delay:
+                time.sleep(delay)
+            call.begin()
+            try:
+                result = (func(*args, **kwargs) if hedge_pool is None
+                          else _call_hedged(hedge_pool, func, args, kwargs, hedge_delay))
+            except call.policy.expected_exceptions as e:
+                call.failed(e, expected=True)
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                call.failed(e)
+            except BaseException:
+                call.interrupted()
+                raise
+            else:
+                return call.succeeded(result)
+        call.give_up()
+        return None
+    finally:
+        call.close()
+
+
+async def _aretry(call, hedge_delay):
+    func, args, kwargs = call.func, call.args, call.kwargs
+    try:
+        for delay in call.delays():
+            if delay:
+                await asyncio.sleep(delay)
+            call.begin()
+            try:
+                result = await (func(*args, **kwargs) if hedge_delay is None
+                                else _acall_hedged(func, args, kwargs, hedge_delay))
+            except call.policy.expected_exceptions as e:
+                call.failed(e, expected=True)
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                call.failed(e)
+            except BaseException:
+                call.interrupted()
+                raise
+            else:
+                return call.succeeded(result)
+        call.give_up()
+        return None
+    finally:
+        call.close()
+
+
+def _check_retry_args(retries, backoff, max_delay, deadline,  # pylint: disable=too-many-arguments
+                      sample_rate, hedge_delay):
     if not isinstance(retries, int):
         raise TypeError("retries must be an integer")
 
     if retries < 0:
         raise ValueError("retries cannot be negative")
 
+    _check_seconds("backoff", backoff, allow_none=False)
+    _check_seconds("max_delay", max_delay)
+    _check_seconds("deadline", deadline)
+
+    if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+        raise ValueError("sample_rate must be between 0 and 1")
+
+    if not callable(hedge_delay):
+        _check_seconds("hedge_delay", hedge_delay)
+
+
+def retry_deco(retries=1, expected_exceptions=None, backoff=0.0,  # pylint: disable=too-many-arguments
+               max_delay=None, deadline=None, logger=None, sample_rate=1.0, budget=None, breaker=None,
+               metrics=None, hedge_delay=None):
+    _check_retry_args(retries, backoff, max_delay, deadline, sample_rate, hedge_delay)
     expected_exceptions = tuple(expected_exceptions or ())
+    policy = _RetryPolicy(retries, expected_exceptions, backoff, max_delay, deadline, logger or LOG, sample_rate,
+                          budget, breaker, metrics)
 
-    def decorator(func):
-        @wraps(func)
-        def inner(*args, **kwargs):
-            last_exception = None
+    # Without shared state to update or a deadline to keep, a call that
+    # succeeds first time needs no bookkeeping: it is only set up once the
+    # first attempt has failed.
+    fast = retries > 0 and deadline is None and hedge_delay is None and budget is None and breaker is None \
+        and metrics is None
+    logger = policy.logger
 
-            for attempt in range(1, retries + 1):
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_inner(*args, **kwargs):
+                if not fast:
+                    return await _aretry(_RetryCall(policy, func, args, kwargs), hedge_delay)
                 try:
-                    result = func(*args, **kwargs)
-                    print(_format_log_message(func, args, kwargs, attempt, result=result))
-                    return result
-
+                    result = await func(*args, **kwargs)
                 except expected_exceptions as e:
-                    print(_format_log_message(func, args, kwargs, attempt, exception=e))
-                    raise e
-
+                    _log_attempt(logger, sample_rate, func, args, kwargs, 1, exception=e)
+                    raise
                 except Exception as e:  # pylint: disable=broad-exception-caught
-                    print(_format_log_message(func, args, kwargs, attempt, exception=e))
-                    last_exception = e
+                    call = _RetryCall(policy, func, args, kwargs, attempt=1)
+                    call.failed(e)
+                else:
+                    _log_attempt(logger, sample_rate, func, args, kwargs, 1, result=result)
+                    return result
+                return await _aretry(call, hedge_delay)
 
-            if retries == 0:
-                raise ValueError("Function not attempted (retries=0)")
+            return async_inner
 
-            if last_exception is not None:
-                raise last_exception
+        hedge_pool = None if hedge_delay is None else _HedgePool(func.__qualname__)
 
-            return None
+        @wraps(func)
+        def inner(*args, **kwargs):
+            if not fast:
+                return _retry(_RetryCall(policy, func, args, kwargs), hedge_pool, hedge_delay)
+            try:
+                result = func(*args, **kwargs)
+            except expected_exceptions as e:
+                _log_attempt(logger, sample_rate, func, args, kwargs, 1, exception=e)
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                call = _RetryCall(policy, func, args, kwargs, attempt=1)
+                call.failed(e)
+            else:
+                _log_attempt(logger, sample_rate, func, args, kwargs, 1, result=result)
+                return result
+            return _retry(call, hedge_pool, hedge_delay)
 
         return inner
     return decorator
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+
     @retry_deco(3)
     def add(a, b):
         return a + b
@@ -0,0 +1,29 @@
+import json
+import unittest
+
+from json_benchmark import MODES, TOKEN, DocSpec, generate_documents, required_keys, run
+
+
+class TestJsonBenchmark(unittest.TestCase):
+    def test_generate_documents(self):
+        spec = DocSpec(docs=10, keys=4, required_keys=2, words_per_value=5, token_density=0.5, seed=1)
+        docs = generate_documents(spec)
+        self.assertEqual(docs, generate_documents(spec))
+        self.assertEqual(10, len(docs))
+        for doc in map(json.loads, docs):
+            self.assertEqual(['key0', 'key1', 'key2', 'key3'], list(doc))
+            self.assertTrue(all(len(value.split()) == 5 for value in doc.values()))
+        self.assertTrue(any(TOKEN.upper() in doc for doc in docs))
+        self.assertEqual(['key0', 'key1'], required_keys(spec))
+
+    def test_report_is_json_and_modes_agree(self):
+        spec = DocSpec(docs=50, keys=5, required_keys=2, words_per_value=10, token_density=0.2)
+        report = json.loads(json.dumps(run(spec, list(MODES), repeat=1)))
+        self.assertEqual(50, report['documents']['docs'])
+        results = report['results']
+        self.assertEqual(list(MODES), [result['mode'] for result in results])
+        self.assertEqual(1, len({result['matches'] for result in results}))
+        for result in results:
+            self.assertGreater(result['docs_per_sec'], 0)
+            self.assertGreater(result['mb_per_sec'], 0)
+            self.assertGreaterEqual(result['peak_memory_bytes'], 0)
@@ -1,7 +1,12 @@
+import io
+import os
+import tempfile
 import unittest
 import json
-from unittest.mock import Mock
-from json_handler import process_json
+from unittest.mock import Mock, patch
+from json_handler import (JsonTokenMatcher, _cached_matcher, _StreamReader, _iter_top_level_strings, process_json,
+                          process_json_stream, process_ndjson)
+# pylint: disable=protected-access
 
 
 class TestProcessJson(unittest.TestCase):
@@ -98,3 +103,286 @@ class TestProcessJson(unittest.TestCase):
     def test_empty_required_keys(self):
         process_json(self.sample_json, [], self.sample_tokens, self.mock_callback)
         self.mock_callback.assert_not_called()
+
+
+class TestProcessJsonStream(unittest.TestCase):
+    def setUp(self):
+        self.mock_callback = Mock()
+
+    def assert_same_as_process_json(self, json_str, required_keys, tokens, chunk_size=3):
+        expected = Mock()
+        process_json(json_str, required_keys, tokens, expected)
+        for stream in (io.StringIO(json_str), io.BytesIO(json_str.encode('utf-8'))):
+            result = Mock()
+            process_json_stream(stream, required_keys, tokens, result, chunk_size=chunk_size)
+            self.assertEqual(expected.call_args_list, result.call_args_list)
+        return expected.call_args_list
+
+    def test_normal_case(self):
+        calls = self.assert_same_as_process_json(
+            '{"key1": "value1 value2", "key2": "value2 value3"}', ["key1", "key2"], ["value1", "VALUE2"])
+        self.assertEqual([(('key1', 'value1'),), (('key1', 'value2'),), (('key2', 'value2'),)], calls)
+
+    def test_skips_nested_and_scalar_values(self):
+        json_str = ('{"skip": {"a": [1, 2, {"b": "}]\\\\"}], "key1": "inner"}, "n": -1.5e3, "t": true, '
+                    '"z": null, "key1": "Привет мир \\"мир\\" \\u043c\\u0438\\u0440", "key2": "мир"}')
+        calls = self.assert_same_as_process_json(json_str, ["key1", "key2"], ["МИР"])
+        self.assertEqual([(('key1', 'мир'),), (('key1', 'мир'),), (('key2', 'мир'),)], calls)
+
+    def test_non_string_required_value_is_skipped(self):
+        process_json_stream(io.StringIO('{"key1": ["value1"], "key2": "value1"}'),
+                            ["key1", "key2"], ["value1"], self.mock_callback)
+        self.assertEqual([(('key2', 'value1'),)], self.mock_callback.call_args_list)
+
+    def test_every_chunk_size(self):
+        json_str = json.dumps({"a": "x \\ \" y", "skip": ["\\\"", {"q": "\\\\"}], "b": "Ёж x ёж"},
+                              ensure_ascii=False)
+        for chunk_size in range(1, len(json_str) + 1):
+            self.assert_same_as_process_json(json_str, ["a", "b"], ["x", "ёж"], chunk_size)
+
+    def test_long_values_and_many_keys(self):
+        doc = {f"k{i}": f"v{i} x" for i in range(2000)}
+        doc["k7"] = "x " + "ab\\\"c " * 5000 + "x"
+        json_str = json.dumps(doc)
+        for chunk_size in (7, 64, 4096):
+            calls = self.assert_same_as_process_json(json_str, ["k7", "k1999"], ["x"], chunk_size)
+            self.assertEqual(3, len(calls))
+
+    def test_empty_json(self):
+        process_json_stream(io.StringIO(" { } "), ["key1"], ["value1"], self.mock_callback)
+        self.mock_callback.assert_not_called()
+
+    def test_invalid_json(self):
+        for json_str in ['{invalid}', '{"a": "b"', '{"a" "b"}', '{"a": }', '{"a": "b"} x', '[1]',
+                         '{"a": "unterminated', '{"a": [1, 2}']:
+            with self.subTest(json_str=json_str):
+                with self.assertRaises(json.JSONDecodeError):
+                    process_json_stream(io.StringIO(json_str), ["a"], ["b"], self.mock_callback, chunk_size=2)
+
+    def test_invalid_utf8(self):
+        with self.assertRaises(UnicodeDecodeError):
+            process_json_stream(io.BytesIO(b'{"a": "\xd0"}'), ["a"], ["b"], self.mock_callback)
+
+    def test_path_input(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "doc.json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"key1": "value1"}')
+            process_json_stream(path, ["key1"], ["value1"], self.mock_callback)
+        self.mock_callback.assert_called_once_with("key1", "value1")
+
+    def test_missing_arguments_and_validation(self):
+        process_json_stream(io.StringIO("not json"), None, ["a"], self.mock_callback)
+        self.mock_callback.assert_not_called()
+        with self.assertRaises(TypeError):
+            process_json_stream(io.StringIO("{}"), ["key1", 1], ["a"], self.mock_callback)
+        with self.assertRaises(TypeError):
+            process_json_stream(io.StringIO("{}"), ["key1"], ["a"], "not a callable")
+
+    def test_skipped_values_are_not_buffered(self):
+        big = "x" * 100_000
+        json_str = json.dumps({"skip": big, "nested": [big, {"k": big}], "key1": "value1"})
+        stream = io.StringIO(json_str)
+        max_buffer = 0
+        read = stream.read
+
+        def tracking_read(size):
+            nonlocal max_buffer
+            max_buffer = max(max_buffer, len(reader.buf))
+            return read(size)
+
+        stream.read = tracking_read
+        reader = _StreamReader(stream, 1024)
+        self.assertEqual([("key1", "value1")], list(_iter_top_level_strings(reader, {"key1"})))
+        self.assertLess(max_buffer, 2048)
+
+
+class TestProcessNdjson(unittest.TestCase):
+    def setUp(self):
+        self.records = [json.dumps({"id": str(i), "key1": f"value{i % 3} other", "key2": "VALUE1"}) + "\n"
+                        for i in range(300)]
+        self.records.insert(5, "\n")
+        self.mock_callback = Mock()
+
+    def expected_calls(self):
+        expected = Mock()
+        for record in self.records:
+            if record.strip():
+                process_json(record, ["key1", "key2"], ["value1"], expected)
+        return expected.call_args_list
+
+    def test_record_order(self):
+        process_ndjson(self.records, ["key1", "key2"], ["value1"], self.mock_callback, workers=2, chunk_size=7)
+        self.assertEqual(self.expected_calls(), self.mock_callback.call_args_list)
+
+    def test_as_completed(self):
+        process_ndjson(self.records, ["key1", "key2"], ["value1"], self.mock_callback,
+                       workers=2, chunk_size=7, ordered=False)
+        self.assertCountEqual(self.expected_calls(), self.mock_callback.call_args_list)
+
+    def test_path_input(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "records.ndjson")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(self.records)
+            process_ndjson(path, ["key1", "key2"], ["value1"], self.mock_callback, workers=1)
+        self.assertEqual(self.expected_calls(), self.mock_callback.call_args_list)
+
+    def test_validated_once_and_missing_arguments(self):
+        with self.assertRaises(TypeError):
+            process_ndjson(self.records, ["key1", 1], ["value1"], self.mock_callback)
+        process_ndjson(["not json"], ["key1"], ["value1"], None)
+        self.mock_callback.assert_not_called()
+
+    def test_invalid_record(self):
+        with self.assertRaises(json.JSONDecodeError):
+            process_ndjson(['{"key1": "value1"}', '{invalid}'], ["key1"], ["value1"], self.mock_callback, workers=1)
+
+
+class TestJsonTokenMatcher(unittest.TestCase):
+    def test_reused_across_documents(self):
+        matcher = JsonTokenMatcher(["key1", "key2"], ["value1", "VALUE2"])
+        self.assertEqual([("key1", "value1"), ("key1", "value2"), ("key2", "value2")],
+                         matcher.match('{"key1": "value1 value2", "key2": "value2 value3"}'))
+        self.assertEqual([("key2", "Value1")], matcher.match('{"key2": "Value1", "key3": "value1"}'))
+        self.assertEqual([], matcher.match('{}'))
+
+    def test_compiled_once(self):
+        matcher = JsonTokenMatcher(("key1",), iter(["a", "B"]))
+        self.assertEqual(frozenset({"key1"}), matcher.required_keys)
+        self.assertEqual(frozenset({"A", "B"}), matcher.token_set)
+
+    def test_match_document(self):
+        matcher = JsonTokenMatcher(["key1"], ["x"])
+        self.assertEqual([("key1", "X"), ("key1", "x")], matcher.match_document({"key1": "X y x"}))
+
+    def test_validation(self):
+        with self.assertRaises(TypeError):
+            JsonTokenMatcher(["key1", 1], ["a"])
+        with self.assertRaises(TypeError):
+            JsonTokenMatcher(["key1"], [None])
+        with self.assertRaises(TypeError):
+            JsonTokenMatcher(["key1"], ["a"]).match(b'{}')
+        with self.assertRaises(json.JSONDecodeError):
+            JsonTokenMatcher(["key1"], ["a"]).match('{invalid}')
+
+
+class TestJsonMatches(unittest.TestCase):
+    def setUp(self):
+        self.json_str = '{"key2": "value2 x VALUE1", "key1": "value1 value2", "key3": "value1"}'
+        self.mock_callback = Mock()
+
+    def test_aggregate_callback_called_once(self):
+        process_json(self.json_str, ["key1", "key2"], ["value1", "value2"], self.mock_callback, aggregate=True)
+        self.mock_callback.assert_called_once()
+        matches = self.mock_callback.call_args.args[0]
+        self.assertEqual(("key1", "key2"), matches.keys)
+        self.assertEqual([1, 1, 0, 0], list(matches.key_ids))
+        self.assertEqual(["value2", "VALUE1", "value1", "value2"], matches.tokens)
+        self.assertEqual(4, len(matches))
+        self.assertEqual({"key2": 2, "key1": 2}, matches.counts())
+
+    def test_pairs_same_as_per_token_callbacks(self):
+        process_json(self.json_str, ["key1", "key2"], ["value1", "value2"], self.mock_callback)
+        matcher = JsonTokenMatcher(["key1", "key2", "key1"], ["value1", "value2"])
+        pairs = list(matcher.collect(self.json_str).pairs())
+        self.assertEqual([call.args for call in self.mock_callback.call_args_list], pairs)
+
+    def test_collect_many_documents_into_one_result(self):
+        matcher = JsonTokenMatcher(["key1"], ["a"])
+        matches = matcher.collect('{"key1": "a b a"}')
+        matcher.collect_document({"key1": "A"}, into=matches)
+        self.assertEqual({"key1": 3}, matches.counts())
+        self.assertEqual(["a", "a", "A"], matches.tokens)
+
+    def test_aggregate_without_matches(self):
+        process_json('{"key1": "nothing"}', ["key1"], ["value1"], self.mock_callback, aggregate=True)
+        matches = self.mock_callback.call_args.args[0]
+        self.assertEqual(0, len(matches))
+        self.assertEqual({}, matches.counts())
+
+    def test_collect_wrong_type(self):
+        with self.assertRaises(TypeError):
+            JsonTokenMatcher(["key1"], ["a"]).collect(123)
+
+
+class TestNestedKeyPaths(unittest.TestCase):
+    def setUp(self):
+        self.json_str = json.dumps({
+            "user": {"name": "Alice Smith", "bio": {"text": "likes smith work"}, "age": 30},
+            "items": [{"title": "smith one"}, {"title": "two"}, {"title": "Smith three"}],
+            "a.b": "smith",
+            "noise": {"deep": [{"title": "smith"}] * 3},
+        })
+        self.mock_callback = Mock()
+
+    def matches(self, required_keys, tokens=("smith",)):
+        process_json(self.json_str, required_keys, list(tokens), self.mock_callback)
+        return [call.args for call in self.mock_callback.call_args_list]
+
+    def test_dotted_path(self):
+        self.assertEqual([("user.name", "Smith"), ("user.bio.text", "smith")],
+                         self.matches(["user.name", "user.bio.text"]))
+
+    def test_jsonpath_syntax(self):
+        self.assertEqual([("$.items[0].title", "smith"), ("$['a.b']", "smith")],
+                         self.matches(["$.items[0].title", "$['a.b']"]))
+
+    def test_wildcard(self):
+        self.assertEqual([("items[*].title", "smith"), ("items[*].title", "Smith")],
+                         self.matches(["items[*].title"]))
+        self.mock_callback.reset_mock()
+        self.assertEqual([("user.*", "Smith")], self.matches(["user.*"]))
+
+    def test_non_string_values_do_not_crash(self):
+        self.assertEqual([], self.matches(["user", "user.age", "items", "missing.path", "user.name.x"]))
+
+    def test_top_level_keys_unchanged(self):
+        self.assertEqual([("a", "x")], JsonTokenMatcher(["a"], ["x"]).match('{"a": "x y", "b": "x"}'))
+
+    def test_plain_keys_with_path_characters(self):
+        json_str = json.dumps({"$ref": "x", "ref": "x y", "*": "x", "other": "x", "a]": "x", "$": "x"})
+        for key in ["$ref", "*", "a]"]:
+            with self.subTest(key=key):
+                self.assertEqual([(key, "x")], JsonTokenMatcher([key], ["x"]).match(json_str))
+        self.assertEqual([("$['*']", "x"), ("$['$']", "x")],
+                         JsonTokenMatcher(["$['$']", "$['*']"], ["x"]).match(json_str))
+        process_json_stream(io.StringIO(json_str), ["$ref", "*", "a]"], ["x"], self.mock_callback)
+        self.assertEqual([(("$ref", "x"),), (("*", "x"),), (("a]", "x"),)], self.mock_callback.call_args_list)
+
+    def test_root_wildcard(self):
+        self.assertEqual([("$.*", "smith")], self.matches(["$.*"]))
+
+    def test_collect_nested(self):
+        matcher = JsonTokenMatcher(["items[*].title", "user.name"], ["smith"])
+        self.assertEqual({"items[*].title": 2, "user.name": 1}, matcher.collect(self.json_str).counts())
+
+    def test_irrelevant_subtrees_not_walked(self):
+        matcher = JsonTokenMatcher(["user.name"], ["smith"])
+        data = json.loads(self.json_str)
+        data["noise"] = Mock(spec=dict)
+        self.assertEqual([("user.name", "Smith")], matcher.match_document(data))
+        data["noise"].items.assert_not_called()
+
+    def test_stream_uses_only_top_level_paths(self):
+        process_json_stream(io.StringIO(self.json_str), ["$['a.b']", "$.user"], ["smith"], self.mock_callback)
+        self.assertEqual([(("$['a.b']", "smith"),)], self.mock_callback.call_args_list)
+        for path in ["user.name", "items[0]", "$.*", "$[*]"]:
+            with self.subTest(path=path):
+                with self.assertRaisesRegex(ValueError, "Only top-level keys can be streamed"):
+                    process_json_stream(io.StringIO(self.json_str), ["a.b", path], ["smith"], self.mock_callback)
+
+    def test_unparsable_paths_are_plain_keys(self):
+        keys = ["a..b", ".a", "a[", "x[y]", "$", "", "a.", "[0"]
+        json_str = json.dumps({key: "x" for key in keys})
+        self.assertEqual([(key, "x") for key in keys], JsonTokenMatcher(keys, ["x"]).match(json_str))
+        process_json_stream(io.StringIO(json_str), keys, ["x"], self.mock_callback)
+        self.assertEqual([((key, "x"),) for key in keys], self.mock_callback.call_args_list)
+
+    def test_process_json_reuses_matcher(self):
+        _cached_matcher.cache_clear()
+        with patch("json_handler.JsonTokenMatcher", wraps=JsonTokenMatcher) as mock_matcher:
+            for _ in range(3):
+                process_json('{"user": {"name": "x"}}', ["user.name", "user"], ["x"], self.mock_callback)
+        mock_matcher.assert_called_once_with(("user.name", "user"), ("x",))
+        self.assertEqual(3, self.mock_callback.call_count)
@@ -1,6 +1,12 @@
+import asyncio
+import inspect
+import logging
+import threading
 import unittest
-from unittest.mock import Mock, call, patch
-from param_decorator import retry_deco
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import ANY, AsyncMock, Mock, call, patch
+import param_decorator
+from param_decorator import CircuitBreaker, CircuitOpenError, RetryBudget, RetryMetrics, retry_deco
 
 
 class TestRetryDeco(unittest.TestCase):
@@ -12,15 +18,15 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             result = wrapped()
         self.assertEqual(result, 42)
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 result = 42')
+            'run "wrapped" attempt = 1 result = 42'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_retry_until_success(self):
         mock = Mock(side_effect=[Exception("fail"), Exception("fail again"), 100])
@@ -29,17 +35,31 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             result = wrapped()
         self.assertEqual(result, 100)
         self.assertEqual(mock.call_count, 3)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = Exception'),
-            call('\nrun "wrapped" attempt = 2 exception = Exception'),
-            call('\nrun "wrapped" attempt = 3 result = 100')
+            'run "wrapped" attempt = 1 exception = Exception',
+            'run "wrapped" attempt = 2 exception = Exception',
+            'run "wrapped" attempt = 3 result = 100'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
+
+    def test_bookkeeping_only_after_first_failure(self):
+        mock = Mock(side_effect=[1, Exception("fail"), 2])
+
+        @retry_deco(retries=2, sample_rate=0)
+        def wrapped():
+            return mock()
+
+        retry_call = param_decorator._RetryCall  # pylint: disable=protected-access
+        with patch("param_decorator._RetryCall", wraps=retry_call) as mock_call:
+            self.assertEqual(1, wrapped())
+            mock_call.assert_not_called()
+            self.assertEqual(2, wrapped())
+        mock_call.assert_called_once_with(ANY, wrapped.__wrapped__, (), {}, attempt=1)
 
     def test_stop_on_expected_exception_and_raise_it(self):
         mock = Mock(side_effect=ValueError("bad value"))
@@ -48,7 +68,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(ValueError) as cm:
                 wrapped()
 
@@ -56,9 +76,9 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = ValueError')
+            'run "wrapped" attempt = 1 exception = ValueError'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_continue_on_unexpected_exception_and_raise_last_one(self):
         mock = Mock(side_effect=[KeyError("unexpected"), KeyError("again"), TypeError("final")])
@@ -67,7 +87,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(TypeError) as cm:
                 wrapped()
 
@@ -75,11 +95,11 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 3)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = KeyError'),
-            call('\nrun "wrapped" attempt = 2 exception = KeyError'),
-            call('\nrun "wrapped" attempt = 3 exception = TypeError')
+            'run "wrapped" attempt = 1 exception = KeyError',
+            'run "wrapped" attempt = 2 exception = KeyError',
+            'run "wrapped" attempt = 3 exception = TypeError'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_args_and_kwargs_combination(self):
         mock = Mock(side_effect=lambda x, y=0: x + y)
@@ -88,16 +108,16 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped(x, y=0):
             return mock(x, y=y)
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             result = wrapped(1, y=2)
 
         self.assertEqual(result, 3)
         self.assertEqual(mock.call_args, call(1, y=2))
 
         expected_calls = [
-            call('\nrun "wrapped" with positional args = (1,) keyword kwargs = {\'y\': 2} attempt = 1 result = 3')
+            'run "wrapped" with positional args = (1,) keyword kwargs = {\'y\': 2} attempt = 1 result = 3'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_retries_equals_one_with_exception(self):
         mock = Mock(side_effect=Exception("fail"))
@@ -106,7 +126,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(Exception) as cm:
                 wrapped()
 
@@ -114,9 +134,9 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = Exception')
+            'run "wrapped" attempt = 1 exception = Exception'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_expected_exception_is_none(self):
         mock = Mock(side_effect=[TypeError("fail"), 100])
@@ -125,16 +145,16 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             result = wrapped()
         self.assertEqual(result, 100)
         self.assertEqual(mock.call_count, 2)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = TypeError'),
-            call('\nrun "wrapped" attempt = 2 result = 100')
+            'run "wrapped" attempt = 1 exception = TypeError',
+            'run "wrapped" attempt = 2 result = 100'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_only_kwargs(self):
         mock = Mock(side_effect=lambda *, x: x * 2)
@@ -143,49 +163,49 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped(*, x):
             return mock(x=x)
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             result = wrapped(x=5)
 
         self.assertEqual(result, 10)
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" with keyword kwargs = {\'x\': 5} attempt = 1 result = 10')
+            'run "wrapped" with keyword kwargs = {\'x\': 5} attempt = 1 result = 10'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
-    def test_print_output_for_success_case(self):
+    def test_log_output_for_success_case(self):
         mock = Mock(side_effect=[Exception("fail"), 100])
 
         @retry_deco(retries=2)
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             wrapped()
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = Exception'),
-            call('\nrun "wrapped" attempt = 2 result = 100')
+            'run "wrapped" attempt = 1 exception = Exception',
+            'run "wrapped" attempt = 2 result = 100'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
-    def test_print_output_for_failed_case(self):
+    def test_log_output_for_failed_case(self):
         mock = Mock(side_effect=[Exception("fail1"), Exception("fail2")])
 
         @retry_deco(retries=2)
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(Exception):
                 wrapped()
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = Exception'),
-            call('\nrun "wrapped" attempt = 2 exception = Exception')
+            'run "wrapped" attempt = 1 exception = Exception',
+            'run "wrapped" attempt = 2 exception = Exception'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_zero_retries_raises_immediately(self):
         mock = Mock(side_effect=Exception("should not be called"))
@@ -194,27 +214,21 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertNoLogs("retry_deco", level="DEBUG"):
             with self.assertRaises(Exception) as cm:
                 wrapped()
 
         self.assertEqual(str(cm.exception), "Function not attempted (retries=0)")
         self.assertEqual(mock.call_count, 0)
 
-        expected_calls = []
-        mock_print.assert_has_calls(expected_calls)
-
     def test_negative_retries_raises_immediately(self):
-        with patch("builtins.print") as mock_print:
+        with self.assertNoLogs("retry_deco", level="DEBUG"):
             with self.assertRaises(ValueError) as cm:
                 @retry_deco(retries=-5)
                 def wrapped():
                     pass
         self.assertEqual(str(cm.exception), "retries cannot be negative")
 
-        expected_calls = []
-        mock_print.assert_has_calls(expected_calls)
-
     def test_invalid_retries_type(self):
         with self.assertRaisesRegex(TypeError, "retries must be an integer"):
             @retry_deco(retries="three")
@@ -229,7 +243,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(Exception) as cm:
                 wrapped()
 
@@ -237,11 +251,11 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 3)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = Exception'),
-            call('\nrun "wrapped" attempt = 2 exception = Exception'),
-            call('\nrun "wrapped" attempt = 3 exception = Exception')
+            'run "wrapped" attempt = 1 exception = Exception',
+            'run "wrapped" attempt = 2 exception = Exception',
+            'run "wrapped" attempt = 3 exception = Exception'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_exception_with_args_and_kwargs_raised_properly(self):
         def faulty_func(x, y=0):
@@ -253,7 +267,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped(x, y=0):
             return mock(x, y=y)
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(RuntimeError) as cm:
                 wrapped(1, y=2)
 
@@ -261,13 +275,13 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" '
-                 'with positional args = (1,) '
-                 'keyword kwargs = {\'y\': 2} '
-                 'attempt = 1 '
-                 'exception = RuntimeError')
+            'run "wrapped" '
+            'with positional args = (1,) '
+            'keyword kwargs = {\'y\': 2} '
+            'attempt = 1 '
+            'exception = RuntimeError'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_exception_with_only_kwargs_raised_properly(self):
         def faulty_func(*, x):
@@ -279,7 +293,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped(*, x):
             return mock(x=x)
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(RuntimeError) as cm:
                 wrapped(x=5)
 
@@ -287,9 +301,9 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" with keyword kwargs = {\'x\': 5} attempt = 1 exception = RuntimeError')
+            'run "wrapped" with keyword kwargs = {\'x\': 5} attempt = 1 exception = RuntimeError'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
 
     def test_multiple_expected_exceptions(self):
         mock = Mock(side_effect=[ValueError("bad value"), TypeError("wrong type")])
@@ -298,7 +312,7 @@ class TestRetryDeco(unittest.TestCase):
         def wrapped():
             return mock()
 
-        with patch("builtins.print") as mock_print:
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
             with self.assertRaises(ValueError) as cm:
                 wrapped()
 
@@ -306,6 +320,681 @@ class TestRetryDeco(unittest.TestCase):
         self.assertEqual(mock.call_count, 1)
 
         expected_calls = [
-            call('\nrun "wrapped" attempt = 1 exception = ValueError')
+            'run "wrapped" attempt = 1 exception = ValueError'
         ]
-        mock_print.assert_has_calls(expected_calls)
+        self.assertEqual(expected_calls, [r.getMessage() for r in logs.records])
+
+
+class TestRetryDecoBackoff(unittest.TestCase):
+
+    def test_exponential_backoff_with_full_jitter(self):
+        mock = Mock(side_effect=[Exception("1"), Exception("2"), Exception("3"), 7])
+
+        @retry_deco(retries=4, backoff=0.1, max_delay=0.3)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), \
+                patch("param_decorator.random.uniform", side_effect=lambda a, b: b) as mock_uniform, \
+                patch("param_decorator.time.sleep") as mock_sleep:
+            self.assertEqual(7, wrapped())
+
+        self.assertEqual([call(0, 0.1), call(0, 0.2), call(0, 0.3)], mock_uniform.call_args_list)
+        self.assertEqual([call(0.1), call(0.2), call(0.3)], mock_sleep.call_args_list)
+
+    def test_no_sleep_after_last_attempt(self):
+        mock = Mock(side_effect=[Exception("1"), Exception("2")])
+
+        @retry_deco(retries=2, backoff=0.1)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), patch("param_decorator.time.sleep") as mock_sleep:
+            with self.assertRaises(Exception):
+                wrapped()
+        self.assertEqual(1, mock_sleep.call_count)
+
+    def test_deadline_stops_retries(self):
+        mock = Mock(side_effect=[Exception("1"), Exception("2"), 5])
+
+        @retry_deco(retries=3, backoff=1, deadline=1.5)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), \
+                patch("param_decorator.random.uniform", side_effect=lambda a, b: b), \
+                patch("param_decorator.time.monotonic", side_effect=[0.0, 0.0, 1.0]), \
+                patch("param_decorator.time.sleep") as mock_sleep:
+            with self.assertRaisesRegex(Exception, "2"):
+                wrapped()
+        mock_sleep.assert_called_once_with(1)
+        self.assertEqual(2, mock.call_count)
+
+    def test_default_policy_does_not_sleep(self):
+        mock = Mock(side_effect=[Exception("1"), 5])
+
+        @retry_deco(retries=2)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), patch("param_decorator.time.sleep") as mock_sleep:
+            self.assertEqual(5, wrapped())
+        mock_sleep.assert_not_called()
+
+    def test_many_retries_do_not_overflow(self):
+        mock = Mock(side_effect=[Exception("fail")] * 1099 + [3])
+
+        @retry_deco(retries=1100, sample_rate=0)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="WARNING"):
+            self.assertEqual(3, wrapped())
+
+        @retry_deco(retries=1100, backoff=0.001, max_delay=0, sample_rate=0)
+        def capped():
+            return mock()
+
+        mock.side_effect = [Exception("fail")] * 1099 + [4]
+        with self.assertLogs("retry_deco", level="WARNING"):
+            self.assertEqual(4, capped())
+
+    def test_invalid_policy(self):
+        with self.assertRaisesRegex(TypeError, "backoff must be a number"):
+            retry_deco(backoff="1")
+        with self.assertRaisesRegex(ValueError, "max_delay cannot be negative"):
+            retry_deco(max_delay=-1)
+        with self.assertRaisesRegex(TypeError, "deadline must be a number"):
+            retry_deco(deadline=True)
+        with self.assertRaisesRegex(TypeError, "backoff must be a number"):
+            retry_deco(backoff=None)
+
+
+class TestRetryDecoAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_retry_coroutine_until_success(self):
+        mock = AsyncMock(side_effect=[Exception("fail"), 100])
+
+        @retry_deco(retries=3, backoff=0.5)
+        async def wrapped(x):
+            return await mock(x)
+
+        self.assertTrue(inspect.iscoroutinefunction(wrapped))
+        with self.assertLogs("retry_deco", level="DEBUG") as logs, \
+                patch("param_decorator.random.uniform", return_value=0.25), \
+                patch("param_decorator.asyncio.sleep") as mock_sleep, \
+                patch("param_decorator.time.sleep") as mock_time_sleep:
+            self.assertEqual(100, await wrapped(1))
+
+        mock_sleep.assert_awaited_once_with(0.25)
+        mock_time_sleep.assert_not_called()
+        self.assertEqual([r.getMessage() for r in logs.records], [
+            'run "wrapped" with positional args = (1,) attempt = 1 exception = Exception',
+            'run "wrapped" with positional args = (1,) attempt = 2 result = 100',
+        ])
+
+    async def test_expected_exception_not_retried(self):
+        mock = AsyncMock(side_effect=ValueError("bad"))
+
+        @retry_deco(retries=3, expected_exceptions=[ValueError])
+        async def wrapped():
+            return await mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaisesRegex(ValueError, "bad"):
+                await wrapped()
+        self.assertEqual(1, mock.await_count)
+
+    async def test_all_attempts_fail(self):
+        mock = AsyncMock(side_effect=[KeyError("1"), TypeError("2")])
+
+        @retry_deco(retries=2)
+        async def wrapped():
+            return await mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaisesRegex(TypeError, "2"):
+                await wrapped()
+
+    async def test_zero_retries(self):
+        @retry_deco(retries=0)
+        async def wrapped():
+            return 1
+
+        with self.assertRaisesRegex(ValueError, "Function not attempted"):
+            await wrapped()
+
+    async def test_deadline(self):
+        mock = AsyncMock(side_effect=[Exception("1"), 5])
+
+        @retry_deco(retries=2, deadline=0)
+        async def wrapped():
+            return await mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), \
+                patch("param_decorator.time.monotonic", side_effect=[0.0, 0.1]):
+            with self.assertRaisesRegex(Exception, "1"):
+                await wrapped()
+
+
+class TestRetryDecoLogging(unittest.TestCase):
+
+    def test_levels(self):
+        mock = Mock(side_effect=[Exception("fail"), 1])
+
+        @retry_deco(retries=2)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
+            wrapped()
+        self.assertEqual([logging.WARNING, logging.DEBUG], [r.levelno for r in logs.records])
+
+    def test_disabled_level_skips_formatting(self):
+        mock = Mock(side_effect=[Exception("fail"), 1])
+
+        @retry_deco(retries=2)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="ERROR"), \
+                patch("param_decorator._format_log_message") as mock_format:
+            logging.getLogger("retry_deco").error("marker")
+            self.assertEqual(1, wrapped())
+        mock_format.assert_not_called()
+
+    def test_message_formatted_lazily(self):
+        @retry_deco(retries=1)
+        def wrapped():
+            return 1
+
+        with self.assertLogs("retry_deco", level="DEBUG") as logs, \
+                patch("param_decorator._format_log_message", return_value="msg") as mock_format:
+            wrapped()
+            mock_format.assert_called_once()
+            self.assertEqual("msg", logs.records[0].getMessage())
+
+    def test_sampling_skips_only_successes(self):
+        mock = Mock(side_effect=[Exception("fail"), 1, 2])
+
+        @retry_deco(retries=2, sample_rate=0.5)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG") as logs, \
+                patch("param_decorator.random.random", side_effect=[0.7, 0.2]):
+            wrapped()
+            wrapped()
+        self.assertEqual([
+            'run "wrapped" attempt = 1 exception = Exception',
+            'run "wrapped" attempt = 1 result = 2',
+        ], [r.getMessage() for r in logs.records])
+
+    def test_zero_sample_rate_keeps_failures(self):
+        mock = Mock(side_effect=[Exception("fail"), 1])
+
+        @retry_deco(retries=2, sample_rate=0)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
+            wrapped()
+        self.assertEqual(['run "wrapped" attempt = 1 exception = Exception'], [r.getMessage() for r in logs.records])
+
+    def test_custom_logger(self):
+        @retry_deco(retries=1, logger=logging.getLogger("custom.retry"))
+        def wrapped():
+            return 1
+
+        with self.assertLogs("custom.retry", level="DEBUG") as logs:
+            wrapped()
+        self.assertEqual(['run "wrapped" attempt = 1 result = 1'], [r.getMessage() for r in logs.records])
+
+    def test_invalid_sample_rate(self):
+        for value in (-0.1, 1.5, "1", True):
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, "sample_rate"):
+                retry_deco(sample_rate=value)
+
+
+class TestRetryBudget(unittest.TestCase):
+
+    def test_budget_caps_retries_across_functions(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=2)
+        first = Mock(side_effect=Exception("down"))
+        second = Mock(side_effect=Exception("down"))
+
+        @retry_deco(retries=3, budget=budget)
+        def wrapped_first():
+            return first()
+
+        @retry_deco(retries=3, budget=budget)
+        def wrapped_second():
+            return second()
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaises(Exception):
+                wrapped_first()
+            with self.assertRaises(Exception):
+                wrapped_second()
+        # Two stored tokens are spent by the first function, 0.5 is not enough for a retry.
+        self.assertEqual(3, first.call_count)
+        self.assertEqual(1, second.call_count)
+
+    def test_successful_calls_refill_budget(self):
+        budget = RetryBudget(ratio=0.25, max_tokens=2)
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+        for _ in range(4):
+            budget.record_call()
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+    def test_tokens_capped(self):
+        budget = RetryBudget(ratio=1, max_tokens=2)
+        for _ in range(10):
+            budget.record_call()
+        self.assertEqual(2, budget.tokens)
+
+    def test_thread_safe(self):
+        budget = RetryBudget(ratio=0, max_tokens=100)
+        spent = []
+
+        def spend():
+            spent.extend(budget.try_spend() for _ in range(50))
+
+        threads = [threading.Thread(target=spend) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(100, sum(spent))
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(ValueError, "ratio cannot be negative"):
+            RetryBudget(ratio=-1)
+        with self.assertRaisesRegex(TypeError, "max_tokens must be a number"):
+            RetryBudget(max_tokens="10")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_on_failure_rate(self):
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=4)
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+
+    def test_old_outcomes_leave_window(self):
+        breaker = CircuitBreaker(failure_rate=0.5, window=10, min_calls=2)
+        with patch("param_decorator.time.monotonic", side_effect=[0.0, 11.0, 11.0]):
+            breaker.record_failure()
+            breaker.record_success()
+            self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_rate=1, min_calls=1, reset_timeout=5, half_open_probes=1)
+        with patch("param_decorator.time.monotonic", return_value=0.0):
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+        with patch("param_decorator.time.monotonic", return_value=5.0):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        with patch("param_decorator.time.monotonic", return_value=10.0):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+            self.assertTrue(breaker.allow())
+
+    def test_decorator_fails_fast_when_open(self):
+        breaker = CircuitBreaker(failure_rate=1, min_calls=2, reset_timeout=60)
+        mock = Mock(side_effect=KeyError("down"))
+
+        @retry_deco(retries=5, breaker=breaker)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaises(CircuitOpenError) as cm:
+                wrapped()
+            self.assertIsInstance(cm.exception.__cause__, KeyError)
+            with self.assertRaises(CircuitOpenError):
+                wrapped()
+        self.assertEqual(2, mock.call_count)
+
+    def test_expected_exception_is_not_a_failure(self):
+        breaker = CircuitBreaker(failure_rate=1, min_calls=1)
+
+        @retry_deco(retries=1, expected_exceptions=[ValueError], breaker=breaker)
+        def wrapped():
+            raise ValueError("bad input")
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            for _ in range(3):
+                with self.assertRaises(ValueError):
+                    wrapped()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(ValueError, "failure_rate"):
+            CircuitBreaker(failure_rate=0)
+        with self.assertRaisesRegex(ValueError, "min_calls"):
+            CircuitBreaker(min_calls=0)
+        with self.assertRaisesRegex(ValueError, "half_open_probes"):
+            CircuitBreaker(half_open_probes=0)
+
+
+class TestCircuitBreakerAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_shared_breaker(self):
+        breaker = CircuitBreaker(failure_rate=1, min_calls=1, reset_timeout=60)
+
+        @retry_deco(retries=2, breaker=breaker)
+        async def failing():
+            raise KeyError("down")
+
+        @retry_deco(retries=2, breaker=breaker)
+        async def healthy():
+            return 1
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaises(CircuitOpenError):
+                await failing()
+        with self.assertRaises(CircuitOpenError):
+            await healthy()
+
+    async def test_cancelled_probe_releases_half_open_slot(self):
+        breaker = CircuitBreaker(failure_rate=1, min_calls=1, reset_timeout=0)
+        calls = []
+
+        @retry_deco(retries=1, breaker=breaker, sample_rate=0)
+        async def wrapped(delay):
+            calls.append(delay)
+            await asyncio.sleep(delay)
+            return delay
+
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(wrapped(5), 0.01)
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        self.assertEqual(0, await wrapped(0))
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        self.assertEqual([5, 0], calls)
+
+    def test_release_outside_half_open_is_noop(self):
+        breaker = CircuitBreaker()
+        breaker.release()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        self.assertTrue(breaker.allow())
+
+
+class TestRetryMetrics(unittest.TestCase):
+
+    def test_records_latency_attempts_and_exceptions(self):
+        metrics = RetryMetrics(latency_buckets=(0.5, 1.0), attempt_buckets=(1, 2, 3))
+        mock = Mock(side_effect=[KeyError("1"), KeyError("2"), 5, 6])
+
+        @retry_deco(retries=3, metrics=metrics)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"), \
+                patch("param_decorator.time.perf_counter", side_effect=[0.0, 0.75, 1.0, 1.25]):
+            wrapped()
+            wrapped()
+
+        entry = metrics.snapshot()[f"{__name__}.{wrapped.__qualname__}"]
+        self.assertEqual({"buckets": {"0.5": 1, "1": 2, "+Inf": 2}, "sum": 1.0, "count": 2}, entry["latency_seconds"])
+        self.assertEqual({"buckets": {"1": 1, "2": 1, "3": 2, "+Inf": 2}, "sum": 4, "count": 2}, entry["attempts"])
+        self.assertEqual({"KeyError": 2}, entry["exceptions"])
+
+    def test_failed_call_is_recorded(self):
+        metrics = RetryMetrics()
+
+        @retry_deco(retries=2, expected_exceptions=[ValueError], metrics=metrics)
+        def wrapped():
+            raise ValueError("bad")
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaises(ValueError):
+                wrapped()
+        entry = metrics.snapshot()[f"{__name__}.{wrapped.__qualname__}"]
+        self.assertEqual(1, entry["attempts"]["count"])
+        self.assertEqual({"ValueError": 1}, entry["exceptions"])
+
+    def test_same_name_in_different_modules(self):
+        metrics = RetryMetrics()
+
+        def fetch():
+            return 1
+
+        def other():
+            return 2
+
+        other.__module__, other.__qualname__ = "other_module", fetch.__qualname__
+        retry_deco(metrics=metrics, sample_rate=0)(fetch)()
+        retry_deco(metrics=metrics, sample_rate=0)(other)()
+        self.assertEqual({f"{__name__}.{fetch.__qualname__}", f"other_module.{fetch.__qualname__}"},
+                         set(metrics.snapshot()))
+
+    def test_prometheus_export(self):
+        metrics = RetryMetrics(latency_buckets=(1.0,), attempt_buckets=(1,))
+        metrics.observe_call('f"x', 0.5, 2)
+        metrics.observe_exception('f"x', KeyError())
+
+        self.assertEqual(
+            "# TYPE retry_deco_call_seconds histogram\n"
+            'retry_deco_call_seconds_bucket{function="f\\"x",le="1"} 1\n'
+            'retry_deco_call_seconds_bucket{function="f\\"x",le="+Inf"} 1\n'
+            'retry_deco_call_seconds_sum{function="f\\"x"} 0.5\n'
+            'retry_deco_call_seconds_count{function="f\\"x"} 1\n'
+            "# TYPE retry_deco_attempts histogram\n"
+            'retry_deco_attempts_bucket{function="f\\"x",le="1"} 0\n'
+            'retry_deco_attempts_bucket{function="f\\"x",le="+Inf"} 1\n'
+            'retry_deco_attempts_sum{function="f\\"x"} 2\n'
+            'retry_deco_attempts_count{function="f\\"x"} 1\n'
+            "# TYPE retry_deco_exceptions_total counter\n"
+            'retry_deco_exceptions_total{function="f\\"x",exception="KeyError"} 1\n',
+            metrics.to_prometheus(),
+        )
+        metrics.observe_call('f"x', 1234567.25, 1)
+        self.assertIn('retry_deco_call_seconds_sum{function="f\\"x"} 1234567.75\n', metrics.to_prometheus())
+
+    def test_shared_between_threads(self):
+        metrics = RetryMetrics()
+
+        @retry_deco(retries=1, metrics=metrics, sample_rate=0)
+        def wrapped():
+            return 1
+
+        threads = [threading.Thread(target=lambda: [wrapped() for _ in range(100)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(800, metrics.snapshot()[f"{__name__}.{wrapped.__qualname__}"]["attempts"]["count"])
+
+    def test_reset_and_invalid_buckets(self):
+        metrics = RetryMetrics()
+        metrics.observe_call("f", 0.1, 1)
+        metrics.reset()
+        self.assertEqual({}, metrics.snapshot())
+        with self.assertRaisesRegex(ValueError, "latency_buckets"):
+            RetryMetrics(latency_buckets=(1, 0.5))
+        with self.assertRaisesRegex(ValueError, "attempt_buckets"):
+            RetryMetrics(attempt_buckets=())
+
+
+class TestRetryMetricsAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_coroutine_metrics(self):
+        metrics = RetryMetrics()
+        mock = AsyncMock(side_effect=[TypeError("1"), 1])
+
+        @retry_deco(retries=2, metrics=metrics)
+        async def wrapped():
+            return await mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            await wrapped()
+        entry = metrics.snapshot()[f"{__name__}.{wrapped.__qualname__}"]
+        self.assertEqual(2, entry["attempts"]["sum"])
+        self.assertEqual({"TypeError": 1}, entry["exceptions"])
+
+
+class TestRetryDecoHedging(unittest.TestCase):
+
+    def test_slow_primary_is_hedged(self):
+        release = threading.Event()
+        calls = []
+
+        @retry_deco(retries=1, hedge_delay=0.01, sample_rate=0)
+        def wrapped():
+            calls.append(threading.current_thread().name)
+            if len(calls) == 1:
+                release.wait(5)
+                return "slow"
+            return "fast"
+
+        try:
+            self.assertEqual("fast", wrapped())
+        finally:
+            release.set()
+        self.assertEqual(2, len(calls))
+
+    def test_fast_primary_is_not_hedged(self):
+        mock = Mock(return_value=1)
+
+        @retry_deco(retries=1, hedge_delay=5, sample_rate=0)
+        def wrapped():
+            return mock()
+
+        self.assertEqual(1, wrapped())
+        self.assertEqual(1, mock.call_count)
+
+    def test_failed_hedge_waits_for_other_attempt(self):
+        release = threading.Event()
+        calls = []
+
+        @retry_deco(retries=1, hedge_delay=0.01, sample_rate=0)
+        def wrapped():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                return "primary"
+            release.set()
+            raise KeyError("hedge")
+
+        self.assertEqual("primary", wrapped())
+
+    def test_both_fail_then_retry(self):
+        mock = Mock(side_effect=[KeyError("1"), 7])
+
+        @retry_deco(retries=2, hedge_delay=5)
+        def wrapped():
+            return mock()
+
+        with self.assertLogs("retry_deco", level="DEBUG") as logs:
+            self.assertEqual(7, wrapped())
+        self.assertEqual([
+            'run "wrapped" attempt = 1 exception = KeyError',
+            'run "wrapped" attempt = 2 result = 7',
+        ], [r.getMessage() for r in logs.records])
+
+    def test_pool_shared_between_calls(self):
+        @retry_deco(retries=1, hedge_delay=5, sample_rate=0)
+        def wrapped():
+            return threading.current_thread().name
+
+        with patch("param_decorator.ThreadPoolExecutor", wraps=ThreadPoolExecutor) as mock_pool:
+            names = [wrapped() for _ in range(5)]
+        mock_pool.assert_called_once()
+        self.assertTrue(all("retry_deco_hedge" in name for name in names))
+
+    def test_concurrent_callers_are_not_queued(self):
+        callers = 64
+        started = threading.Barrier(callers, timeout=5)
+
+        @retry_deco(retries=1, hedge_delay=5, sample_rate=0)
+        def wrapped():
+            started.wait()
+            return 1
+
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            self.assertEqual([1] * callers, list(pool.map(lambda _: wrapped(), range(callers))))
+
+    def test_recursive_call(self):
+        @retry_deco(retries=1, hedge_delay=5, sample_rate=0)
+        def rec(depth):
+            return 0 if depth == 0 else rec(depth - 1) + 1
+
+        self.assertEqual(64, rec(64))
+
+    def test_callable_delay(self):
+        delay = Mock(return_value=5)
+
+        @retry_deco(retries=1, hedge_delay=delay, sample_rate=0)
+        def wrapped():
+            return 1
+
+        self.assertEqual(1, wrapped())
+        delay.assert_called_once_with()
+
+    def test_invalid_delay(self):
+        with self.assertRaisesRegex(ValueError, "hedge_delay cannot be negative"):
+            retry_deco(hedge_delay=-1)
+        with self.assertRaisesRegex(TypeError, "hedge_delay must be a number"):
+            retry_deco(hedge_delay="p95")
+
+
+class TestRetryDecoHedgingAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_loser_is_cancelled(self):
+        cancelled = asyncio.Event()
+        calls = []
+
+        @retry_deco(retries=1, hedge_delay=0.01, sample_rate=0)
+        async def wrapped():
+            calls.append(1)
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return "slow"
+            return "fast"
+
+        self.assertEqual("fast", await wrapped())
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    async def test_fast_primary_is_not_hedged(self):
+        mock = AsyncMock(return_value=1)
+
+        @retry_deco(retries=1, hedge_delay=5, sample_rate=0)
+        async def wrapped():
+            return await mock()
+
+        self.assertEqual(1, await wrapped())
+        self.assertEqual(1, mock.await_count)
+
+    async def test_both_fail(self):
+        calls = []
+
+        @retry_deco(retries=1, hedge_delay=0)
+        async def wrapped():
+            calls.append(1)
+            await asyncio.sleep(0.01 * len(calls))
+            raise KeyError(len(calls))
+
+        with self.assertLogs("retry_deco", level="DEBUG"):
+            with self.assertRaises(KeyError):
+                await wrapped()
+        self.assertEqual(2, len(calls))